@@ -6,3 +6,6 @@ class InventoryAppConfig(AppConfig):
     name = 'inventory_app'
     verbose_name = 'نظام إدارة المستودع'
 
+    def ready(self):
+        # تسجيل الإشارات (فهارس الذاكرة)
+        from . import signals  # noqa: F401
@@ -0,0 +1,65 @@
+"""
+توحيد النصوص العربية للبحث
+- حذف التشكيل والتطويل
+- توحيد أشكال الألف (أ إ آ ٱ -> ا) والتاء المربوطة (ة -> ه) والألف المقصورة (ى -> ي)
+- توحيد الهمزة على الواو والياء (ؤ -> و، ئ -> ي) والأرقام العربية الهندية
+"""
+import re
+
+
+# التشكيل (الفتحة ... السكون، علامات القرآن) + الألف الخنجرية + التطويل
+DIACRITICS_RE = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+LETTER_MAP = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+
+def normalize_arabic(text):
+    """إرجاع نسخة موحدة من النص للبحث (أحرف صغيرة للاتينية أيضاً)"""
+    if not text:
+        return ''
+    text = DIACRITICS_RE.sub('', text)
+    text = text.translate(LETTER_MAP)
+    text = WHITESPACE_RE.sub(' ', text).strip()
+    return text.lower()
+
+
+def backfill_normalized_names(model, chunk_size=1000, only_missing=False):
+    """
+    حساب name_normalized للمنتجات الموجودة على دفعات (ترتيب بالمعرف)
+    model: Product أو النموذج التاريخي داخل migration
+    يعيد عدد المنتجات التي تم تحديثها
+    """
+    updated = 0
+    last_pk = 0
+    while True:
+        queryset = model.objects.filter(pk__gt=last_pk)
+        if only_missing:
+            queryset = queryset.filter(name_normalized='')
+        rows = list(queryset.order_by('pk').only('pk', 'name', 'name_normalized')[:chunk_size])
+        if not rows:
+            break
+
+        changed = []
+        for row in rows:
+            normalized = normalize_arabic(row.name)
+            if row.name_normalized != normalized:
+                row.name_normalized = normalized
+                changed.append(row)
+        if changed:
+            model.objects.bulk_update(changed, ['name_normalized'])
+            updated += len(changed)
+
+        last_pk = rows[-1].pk
+    return updated
@@ -0,0 +1,261 @@
+"""
+الإكمال التلقائي لأرقام المنتجات من الذاكرة
+- مصفوفة مرتبة + bisect بدلاً من استعلام قاعدة بيانات لكل ضغطة مفتاح
+- تُبنى عند أول استخدام وتُحدَّث تدريجياً من سجل ProductNumberChange
+- المطابقة غير حساسة لحالة الأحرف (المفاتيح بالأحرف الكبيرة)
+- إشارات Product (انظر signals.py) تكتب الأرقام المتغيرة في السجل داخل معاملة التعديل
+  (لا رفع لعداد إصدار - فإنشاء المنتجات لا يزيد استعلامات DataVersion)
+- كل عملية (worker) تقرأ السجل مرة كل CHANGE_CHECK_SECONDS على الأكثر وليس في كل ضغطة مفتاح،
+  وتعيد التحقق من الأرقام الجديدة فيه من جدول المنتجات ثم تضيفها أو تحذفها من المصفوفة (بدون إعادة بناء)
+  فيظهر الرقم المضاف أو المحذوف في العمليات الأخرى خلال ثانيتين تقريباً، وفي العملية التي أجرت التعديل عند الطلب التالي
+- إعادة البناء الكامل فقط عند أول استخدام، أو تسجيل إعادة بناء (حذف جماعي / استعادة نسخة احتياطية)،
+  أو إذا لم تقرأ العملية السجل لمدة قريبة من CHANGE_RETENTION_SECONDS (حُذفت سجلات لم ترها)
+"""
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .data_versions import mark_changed, pending_items
+from .models import Product, ProductNumberChange
+
+
+# أقصى مدة (بالثواني) بين قراءتين لسجل التغييرات في كل عملية
+CHANGE_CHECK_SECONDS = 2
+# هامش إعادة قراءة السجل: المعاملة قد تلتزم بعد وقت كتابة السطر، وساعات الخوادم قد تختلف قليلاً
+CHANGE_WINDOW_SECONDS = 60
+# مدة الاحتفاظ بسجلات التغييرات قبل حذفها (وحذفها مرة كل CHANGE_PRUNE_SECONDS على الأكثر)
+CHANGE_RETENTION_SECONDS = 24 * 60 * 60
+CHANGE_PRUNE_SECONDS = 60 * 60
+BUILD_CHUNK_SIZE = 10000
+
+# أنواع عناصر المعاملة (data_versions.mark_changed)
+NUMBERS = 'numbers'
+RESET = 'reset'
+
+
+class ProductNumberIndex:
+    """فهرس مرتب لأرقام المنتجات للبحث بالبادئة"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # _keys[i] هو _numbers[i] بالأحرف الكبيرة (نفس الكائن إذا لم يختلف)
+        self._keys = None
+        self._numbers = None
+        self._bytes = 0
+        # سطور السجل المطبقة ضمن نافذة القراءة الحالية {المعرف: وقت التغيير}
+        self._seen = {}
+        # وقت آخر قراءة للسجل (وقت قاعدة البيانات) ووقتها بساعة العملية (لتحديد المدة بين القراءات)
+        self._polled_at = None
+        self._checked_at = 0.0
+        self._pruned_at = None
+        self.built_at = None
+        self.build_seconds = None
+        self.lookups = 0
+        self.changes_applied = 0
+
+    # ---------- البناء ----------
+
+    def _ensure_fresh(self):
+        if self._keys is None:
+            self.rebuild()
+        elif time.monotonic() - self._checked_at >= CHANGE_CHECK_SECONDS:
+            self._poll()
+
+    def rebuild(self):
+        """إعادة بناء الفهرس بالكامل من قاعدة البيانات"""
+        started = time.perf_counter()
+        polled_at = timezone.now()
+        self._prune(polled_at)
+        # السجل قبل قراءة المنتجات: ما يظهر فيه لاحقاً يُعاد التحقق منه حتى لو كان ضمن القراءة
+        seen = dict(
+            ProductNumberChange.objects.filter(
+                created_at__gte=polled_at - timedelta(seconds=CHANGE_WINDOW_SECONDS)
+            ).values_list('id', 'created_at')
+        )
+
+        numbers = Product.objects.values_list('product_number', flat=True).iterator(chunk_size=BUILD_CHUNK_SIZE)
+        pairs = sorted((self._key_for(number), number) for number in numbers)
+        keys = [key for key, _ in pairs]
+        values = [number for _, number in pairs]
+        del pairs
+
+        size = sys.getsizeof(keys) + sys.getsizeof(values)
+        for key, number in zip(keys, values):
+            size += self._entry_size(key, number)
+
+        with self._lock:
+            self._keys = keys
+            self._numbers = values
+            self._bytes = size
+            self._seen = seen
+            self._polled_at = polled_at
+            self._checked_at = time.monotonic()
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+
+    def _poll(self):
+        """تطبيق التغييرات الجديدة في السجل منذ القراءة السابقة"""
+        polled_at = timezone.now()
+        if polled_at - self._polled_at > timedelta(seconds=CHANGE_RETENTION_SECONDS - CHANGE_WINDOW_SECONDS):
+            self.rebuild()
+            return
+        self._prune(polled_at)
+
+        rows = list(
+            ProductNumberChange.objects.filter(
+                created_at__gte=self._polled_at - timedelta(seconds=CHANGE_WINDOW_SECONDS)
+            ).values_list('id', 'product_number', 'created_at')
+        )
+        changed = [number for change_id, number, _ in rows if change_id not in self._seen]
+        if None in changed:
+            self.rebuild()
+            return
+
+        # السجل لا يحدد الإضافة من الحذف - الحالة الحالية في جدول المنتجات هي المرجع
+        # (تكرار تطبيق نفس السطر أو ترتيب الالتزام بين المعاملات لا يغير النتيجة)
+        existing = set()
+        if changed:
+            existing = set(
+                Product.objects.filter(product_number__in=set(changed)).values_list('product_number', flat=True)
+            )
+
+        with self._lock:
+            if self._keys is None:
+                return
+            for number in set(changed):
+                if number in existing:
+                    self._insert(number)
+                else:
+                    self._remove(number)
+            self.changes_applied += len(changed)
+            # السطور الأقدم من بداية النافذة التالية لن تُقرأ مرة أخرى
+            self._seen = {change_id: created_at for change_id, _, created_at in rows}
+            self._polled_at = polled_at
+            self._checked_at = time.monotonic()
+
+    def _prune(self, now):
+        if self._pruned_at is not None and now - self._pruned_at < timedelta(seconds=CHANGE_PRUNE_SECONDS):
+            return
+        self._pruned_at = now
+        ProductNumberChange.objects.filter(
+            created_at__lt=now - timedelta(seconds=CHANGE_RETENTION_SECONDS)
+        ).delete()
+
+    @staticmethod
+    def _key_for(number):
+        key = number.upper()
+        return number if key == number else key
+
+    @staticmethod
+    def _entry_size(key, number):
+        # حجم النص + مؤشرين في القائمتين (النص المشترك يُحسب مرة واحدة)
+        size = sys.getsizeof(number) + 2 * 8
+        if key is not number:
+            size += sys.getsizeof(key)
+        return size
+
+    # ---------- القراءة ----------
+
+    def complete(self, prefix, limit=10, after=None):
+        """
+        أول limit رقم منتج يبدأ بالبادئة المعطاة
+        after: آخر رقم في الصفحة السابقة (ترقيم بالمؤشر للصفحات التالية)
+        """
+        prefix = (prefix or '').strip().upper()
+        if not prefix:
+            return []
+
+        self._ensure_fresh()
+        with self._lock:
+            self.lookups += 1
+            keys = self._keys
+            index = bisect_left(keys, prefix)
+            if after:
+                # الترتيب (المفتاح، الرقم) - نتخطى كل ما قبل after أو يساويه
+                after_key = self._key_for(after)
+                index = max(index, bisect_left(keys, after_key))
+                while index < len(keys) and keys[index] == after_key and self._numbers[index] <= after:
+                    index += 1
+            results = []
+            while index < len(keys) and len(results) < limit and keys[index].startswith(prefix):
+                results.append(self._numbers[index])
+                index += 1
+            return results
+
+    def all_numbers(self):
+        """جميع أرقام المنتجات (نسخة للقراءة)"""
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._numbers)
+
+    # ---------- التحديث التدريجي ----------
+
+    def _insert(self, number):
+        key = self._key_for(number)
+        index = bisect_left(self._keys, key)
+        # تجنب التكرار
+        while index < len(self._keys) and self._keys[index] == key:
+            if self._numbers[index] == number:
+                return
+            index += 1
+        self._keys.insert(index, key)
+        self._numbers.insert(index, number)
+        self._bytes += self._entry_size(key, number)
+
+    def _remove(self, number):
+        key = self._key_for(number)
+        index = bisect_left(self._keys, key)
+        while index < len(self._keys) and self._keys[index] == key:
+            if self._numbers[index] == number:
+                del self._keys[index]
+                del self._numbers[index]
+                self._bytes -= self._entry_size(key, number)
+                return
+            index += 1
+
+    def numbers_changed(self, *numbers):
+        """تسجيل أرقام أُضيفت أو حُذفت أو تغيرت داخل معاملة التعديل"""
+        if any(kind == RESET for kind, _ in pending_items(self)):
+            # إعادة البناء المسجلة في نفس المعاملة تغطي هذه الأرقام (الحذف الجماعي لا يكتب سطراً لكل منتج)
+            return
+        changes = ProductNumberChange.objects.bulk_create(
+            [ProductNumberChange(product_number=number) for number in numbers]
+        )
+        mark_changed(owner=self, item=(NUMBERS, [change.id for change in changes]))
+
+    def invalidate(self):
+        """تسجيل إعادة بناء الفهرس في كل العمليات (للتعديلات الجماعية واستيراد النسخ الاحتياطية)"""
+        if any(kind == RESET for kind, _ in pending_items(self)):
+            return
+        change = ProductNumberChange.objects.create(product_number=None)
+        mark_changed(owner=self, item=(RESET, change.id))
+
+    def apply_committed(self, versions, items):
+        """بعد التزام المعاملة: قراءة السجل عند الطلب التالي (لا شيء يُطبق إذا لم يُبنَ الفهرس)"""
+        resets = [value for kind, value in items if kind == RESET]
+        if resets and not ProductNumberChange.objects.filter(id__in=resets).exists():
+            # أُلغي savepoint سجل إعادة البناء، وربما تخطينا بعده تسجيل أرقام - نسجلها من جديد
+            ProductNumberChange.objects.create(product_number=None)
+        self._checked_at = float('-inf')
+
+    # ---------- الإحصائيات ----------
+
+    def stats(self):
+        """حجم الفهرس في الذاكرة ووقت آخر إعادة بناء"""
+        with self._lock:
+            return {
+                'built': self._keys is not None,
+                'entries': len(self._keys) if self._keys is not None else 0,
+                'memory_bytes': self._bytes,
+                'build_seconds': round(self.build_seconds, 4) if self.build_seconds is not None else None,
+                'built_at': self.built_at,
+                'changes_applied': self.changes_applied,
+                'lookups': self.lookups,
+            }
+
+
+product_number_index = ProductNumberIndex()
@@ -0,0 +1,176 @@
+"""
+قائمة انتظار تأكيد الطلبيات (الوضع غير المتزامن لـ confirm_products)
+- الطلب: التحقق من صيغة البيانات ووجود المنتجات ثم حفظ ConfirmationJob وإرجاع رقم التذكرة فوراً
+- المنفذ (manage.py process_confirmation_jobs): يحجز دفعة طلبات بـ SELECT ... FOR UPDATE SKIP LOCKED
+  فيمكن تشغيل أكثر من منفذ معاً بدون أن يأخذ اثنان نفس الطلب
+- طلبات الدفعة لنفس المستخدم تُخصم معاً بمسار الخصم الجماعي (طلبية لكل طلب بإدخال واحد)؛
+  إذا فشل الخصم المشترك يُعاد تنفيذ كل طلب وحده حتى لا يُفشل طلب واحد بقية الدفعة
+- أي خطأ آخر (وليس نقص المخزون فقط) يُفشل طلبه وحده مع نص الخطأ وتُحفظ بقية الدفعة
+- العميل يتابع النتيجة (order_number) عبر /api/confirm-products/jobs/<ticket>/
+"""
+import logging
+from collections import OrderedDict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .deductions import DeductionError
+from .models import ConfirmationJob, Product
+from .waves import deduct_and_create_orders
+
+
+DEFAULT_BATCH_SIZE = 50
+
+logger = logging.getLogger('inventory_app')
+
+
+class QueueError(ValueError):
+    """بيانات طلب التأكيد غير صالحة"""
+
+    def __init__(self, errors):
+        super().__init__(errors[0])
+        self.errors = errors
+
+
+def parse_confirmation(data):
+    """
+    التحقق من بيانات confirm_products وتحويلها إلى (اسم المستلم، [(رقم المنتج، الكمية)])
+    المنتجات غير الموجودة تُرفض هنا باستعلام واحد - كفاية المخزون يحددها المنفذ عند الخصم
+    """
+    recipient_name = (data.get('recipient_name') or '').strip()
+    lines = []
+    errors = []
+    for item in data.get('products', []):
+        number = str(item.get('number') or '').strip()
+        try:
+            quantity = int(item.get('quantity', 0))
+        except (TypeError, ValueError):
+            errors.append(f'الكمية غير صالحة للمنتج {number}')
+            continue
+        if quantity < 0:
+            errors.append(f'الكمية غير صالحة للمنتج {number}')
+            continue
+        lines.append((number, quantity))
+
+    if not lines and not errors:
+        errors.append('لا توجد منتجات للتأكيد')
+    if errors:
+        raise QueueError(errors)
+
+    numbers = {number for number, _ in lines}
+    existing = set(Product.objects.filter(product_number__in=numbers).values_list('product_number', flat=True))
+    missing = [number for number in OrderedDict.fromkeys(n for n, _ in lines) if number not in existing]
+    if missing:
+        raise QueueError([f'المنتج {number} غير موجود' for number in missing])
+
+    return recipient_name, lines
+
+
+def enqueue_confirmation(data, username):
+    """حفظ طلب تأكيد في قائمة الانتظار - يرفع QueueError إذا كانت البيانات غير صالحة"""
+    recipient_name, lines = parse_confirmation(data)
+    return ConfirmationJob.objects.create(
+        payload={
+            'recipient_name': recipient_name,
+            'products': [[number, quantity] for number, quantity in lines],
+        },
+        user=username,
+    )
+
+
+def _parsed(job):
+    return (
+        job.payload.get('recipient_name', ''),
+        [(number, quantity) for number, quantity in job.payload.get('products', [])],
+    )
+
+
+def _succeed(job, order, updated_products, now):
+    job.status = ConfirmationJob.STATUS_DONE
+    job.order_number = order.order_number
+    job.finished_at = now
+    job.result = {
+        'success': True,
+        'updated_products': updated_products,
+        'message': f'تم خصم {len(updated_products)} منتج',
+        'order_number': order.order_number,
+    }
+
+
+def _fail(job, errors, now):
+    job.status = ConfirmationJob.STATUS_FAILED
+    job.finished_at = now
+    job.result = {'success': False, 'error': errors[0], 'errors': errors}
+
+
+def _unexpected(job, error, now):
+    """خطأ غير متوقع في طلب واحد (بيانات تالفة، تعارض في قاعدة البيانات...) - يُسجل ويُفشل الطلب وحده"""
+    logger.exception(f'Confirmation job {job.ticket} failed')
+    _fail(job, [f'تعذر تنفيذ الطلب: {error}'], now)
+
+
+def _apply_group(jobs, username, now):
+    """
+    خصم طلبات مستخدم واحد معاً، وعند الفشل كل طلب وحده (كل محاولة داخل savepoint)
+    أي خطأ في طلب يُلغي savepoint الخاص به فقط ويُسجل في الطلب، فلا يُلغي حجز بقية الدفعة
+    ولا يبقى الطلب التالف pending يوقف المنفذ في كل تشغيل
+    """
+    runnable = []
+    for job in jobs:
+        try:
+            runnable.append((job, _parsed(job)))
+        except Exception as e:
+            _unexpected(job, e, now)
+
+    if len(runnable) > 1:
+        try:
+            with transaction.atomic():
+                orders, updated_products = deduct_and_create_orders([p for _, p in runnable], username)
+        except Exception:
+            # طلب واحد على الأقل فشل - نحدده بتنفيذ كل طلب وحده
+            pass
+        else:
+            position = 0
+            for (job, (_, lines)), order in zip(runnable, orders):
+                _succeed(job, order, updated_products[position:position + len(lines)], now)
+                position += len(lines)
+            return
+
+    for job, job_parsed in runnable:
+        try:
+            with transaction.atomic():
+                orders, updated_products = deduct_and_create_orders([job_parsed], username)
+        except DeductionError as e:
+            _fail(job, e.errors, now)
+        except Exception as e:
+            _unexpected(job, e, now)
+        else:
+            _succeed(job, orders[0], updated_products, now)
+
+
+@transaction.atomic
+def process_pending_jobs(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    حجز وتنفيذ دفعة من الطلبات المنتظرة في معاملة واحدة
+    يعيد (عدد الناجحة، عدد الفاشلة)
+    """
+    jobs = list(
+        ConfirmationJob.objects
+        .select_for_update(skip_locked=True)
+        .filter(status=ConfirmationJob.STATUS_PENDING)
+        .order_by('created_at', 'id')[:batch_size]
+    )
+    if not jobs:
+        return 0, 0
+
+    now = timezone.now()
+    groups = OrderedDict()
+    for job in jobs:
+        groups.setdefault(job.user, []).append(job)
+    for username, group in groups.items():
+        _apply_group(group, username, now)
+
+    ConfirmationJob.objects.bulk_update(jobs, ['status', 'order_number', 'result', 'finished_at'])
+
+    done = sum(1 for job in jobs if job.status == ConfirmationJob.STATUS_DONE)
+    return done, len(jobs) - done
@@ -0,0 +1,150 @@
+"""
+عدادات إصدار البيانات المشتركة بين العمليات (workers)
+- كل اسم عداد يُرفع عند أي تعديل على البيانات التي يمثلها
+- مخزنة في جدول DataVersion وليس في Django cache: CACHES هو LocMemCache خاص بكل عملية،
+  فرفع الإصدار في عملية لا يصل للأخرى، فتبقى فهارسها قديمة وتعطي ETag مكرراً لبيانات مختلفة
+- القراءة استعلام واحد على الفهرس الفريد name، والرفع عبارة UPDATE ... RETURNING ذرية
+  (لا يضيع رفع بين عمليتين متزامنتين، والقيمة المعادة متتالية تماماً)
+- تبدأ العدادات من قيمة مبنية على الوقت حتى لا تتكرر الإصدارات بعد إعادة إنشاء قاعدة البيانات
+  (وإلا قد يطابق ETag قديم بيانات مختلفة)
+- mark_changed: التعديلات داخل المعاملة تُجمع (أسماء العدادات + تعديلات الفهارس في الذاكرة)
+  وتُطبق مرة واحدة عند الالتزام: عبارة UPDATE واحدة لكل العدادات مهما كان عدد الصفوف المعدلة
+"""
+import time
+
+from django.db import connection, transaction, IntegrityError
+
+from .models import DataVersion
+
+
+# جداول البيانات التي تُتتبع تعديلاتها (تُرفع من signals.py)
+PRODUCTS = 'products'
+LOCATIONS = 'locations'
+WAREHOUSES = 'warehouses'
+# الطلبيات: يُرفع عند الحذف فقط - الإنشاء يُحتسب تدريجياً في order_summary
+ORDERS = 'orders'
+
+BUMP_SQL = f'UPDATE {DataVersion._meta.db_table} SET version = version + 1 WHERE name IN ({{names}}) RETURNING name, version'
+
+
+def _initial_version():
+    return int(time.time() * 1000)
+
+
+def _create(name):
+    """إنشاء العداد إذا لم يكن موجوداً - يعيد False إذا أنشأته عملية متزامنة"""
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(name=name, version=_initial_version())
+        return True
+    except IntegrityError:
+        return False
+
+
+def _bump(names):
+    with connection.cursor() as cursor:
+        cursor.execute(BUMP_SQL.format(names=', '.join(['%s'] * len(names))), names)
+        return dict(cursor.fetchall())
+
+
+def bump_versions(names):
+    """رفع عدة عدادات بعبارة واحدة - يعيد {الاسم: الإصدار الجديد}"""
+    # ترتيب ثابت للأسماء يقلل التعارض (deadlock) بين عمليتين ترفعان نفس العدادات
+    names = sorted(set(names))
+    if not names:
+        return {}
+    versions = _bump(names)
+    missing = [name for name in names if name not in versions]
+    if missing:
+        for name in missing:
+            _create(name)
+        versions.update(_bump(missing))
+    return versions
+
+
+def bump_version(name):
+    """رفع العداد وإرجاع الإصدار الجديد"""
+    return bump_versions([name])[name]
+
+
+def get_version(name):
+    """الإصدار الحالي للعداد (يُنشأ إذا لم يكن موجوداً)"""
+    return get_versions(name)[0]
+
+
+def get_versions(*names):
+    """إصدارات عدة عدادات باستعلام واحد"""
+    found = dict(DataVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    missing = [name for name in names if name not in found]
+    if missing:
+        for name in missing:
+            _create(name)
+        found.update(DataVersion.objects.filter(name__in=missing).values_list('name', 'version'))
+    return [found[name] for name in names]
+
+
+# ========== تجميع التعديلات لكل معاملة ==========
+
+class _CommitBatch:
+    """تعديلات معاملة واحدة: أسماء العدادات وعناصر لكل فهرس (owner)"""
+
+    def __init__(self):
+        self.names = set()
+        self.items = {}
+        # نفس الكائن المسجل في on_commit - لمعرفة هل ما زال مسجلاً
+        self.callback = self.run
+
+    def run(self):
+        versions = bump_versions(self.names)
+        for owner, items in self.items.items():
+            owner.apply_committed(versions, items)
+
+
+def _registered_batch(conn):
+    """دفعة المعاملة الحالية إذا كانت ما زالت مسجلة في on_commit"""
+    batch = getattr(conn, '_data_versions_batch', None)
+    # عند إلغاء المعاملة (أو savepoint سُجلت فيه الدفعة) يحذف Django الدالة من run_on_commit
+    # فنبدأ دفعة جديدة - التعديلات المسجلة فيها أُلغيت معها
+    if batch is None or not any(func is batch.callback for _, func, _ in conn.run_on_commit):
+        return None
+    return batch
+
+
+def _current_batch():
+    """دفعة المعاملة الحالية - None خارج transaction.atomic (التطبيق فوري)"""
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        return None
+    batch = _registered_batch(conn)
+    if batch is None:
+        batch = _CommitBatch()
+        conn._data_versions_batch = batch
+        transaction.on_commit(batch.callback)
+    return batch
+
+
+def mark_changed(*names, owner=None, item=None):
+    """
+    تسجيل تعديل في المعاملة الحالية
+    - names: عدادات تُرفع مرة واحدة عند الالتزام
+    - owner / item: يُستدعى owner.apply_committed(versions, items) مرة واحدة بكل العناصر
+      (تعديل داخل savepoint أُلغي قد يبقى في الدفعة - يجب أن تكون العناصر آمنة عند التكرار، مثل التفريغ)
+    """
+    batch = _current_batch()
+    if batch is None:
+        batch = _CommitBatch()
+        batch.names.update(names)
+        if owner is not None:
+            batch.items[owner] = [item]
+        batch.run()
+        return
+    batch.names.update(names)
+    if owner is not None:
+        batch.items.setdefault(owner, []).append(item)
+
+
+def pending_items(owner):
+    """عناصر owner المسجلة في المعاملة الحالية حتى الآن ([] خارج transaction.atomic)"""
+    conn = transaction.get_connection()
+    batch = _registered_batch(conn) if conn.in_atomic_block else None
+    return batch.items.get(owner, []) if batch else []
@@ -2,10 +2,19 @@
 Decorators مخصصة للتحكم في الصلاحيات
 جميع الصلاحيات مبنية في ملفات النظام الخاصة
 """
+import hashlib
+import json
 from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import condition
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from datetime import timedelta
+
+from .data_versions import get_versions
 
 
 def admin_required(view_func):
@@ -92,6 +101,147 @@ def exclude_admin_dashboard(view_func):
     return _wrapped_view
 
 
+def data_version_etag(*tables):
+    """
+    GET شرطي (ETag) مبني على عدادات إصدار الجداول
+    إذا أرسل العميل If-None-Match مطابقاً يُرجع 304 بدون تنفيذ الـ view واستعلاماته
+    العدادات في قاعدة البيانات (جدول DataVersion) وليست في cache العملية، فكل workers يعطون
+    نفس ETag لنفس البيانات، وأي تعديل ملتزم يغيّره في جميعها (استعلام واحد لكل الجداول)
+    """
+    def etag_func(request, *args, **kwargs):
+        versions = get_versions(*tables)
+        raw = f"{request.get_full_path()}|{'|'.join(str(v) for v in versions)}"
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return condition(etag_func=etag_func)
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def _replay_response(record):
+    response = HttpResponse(record.response_body, status=record.status_code, content_type=record.content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _idempotency_scope(request):
+    """صاحب المفتاح: المستخدم، أو الجلسة للطلبات بدون تسجيل دخول"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key is None:
+        request.session.save()
+    return f'session:{request.session.session_key}'
+
+
+def _is_success(response):
+    """نجاح العملية: 2xx وليس success: false في JSON (فشل قاعدة عمل مثل الكمية غير كافية)"""
+    if not 200 <= response.status_code < 300:
+        return False
+    if not response.get('Content-Type', '').startswith('application/json'):
+        return True
+    try:
+        data = json.loads(response.content)
+    except ValueError:
+        return True
+    return not (isinstance(data, dict) and data.get('success') is False)
+
+
+def _request_fingerprint(request):
+    """
+    بصمة محتوى الطلب لمقارنة الطلبات بنفس المفتاح
+    multipart (رفع ملف): الحقول + اسم وحجم كل ملف وتجزئته بالقراءة على أجزاء (chunks)،
+    لأن request.body يقرأ الرفع كاملاً في الذاكرة ويرفع RequestDataTooBig فوق DATA_UPLOAD_MAX_MEMORY_SIZE
+    """
+    if not request.content_type.startswith('multipart/'):
+        return hashlib.sha256(request.body).hexdigest()
+    
+    digest = hashlib.sha256()
+    for name in sorted(request.POST):
+        for value in request.POST.getlist(name):
+            digest.update(f'{name}={value}\n'.encode('utf-8'))
+    for name in sorted(request.FILES):
+        for uploaded_file in request.FILES.getlist(name):
+            digest.update(f'{name}:{uploaded_file.name}:{uploaded_file.size}\n'.encode('utf-8'))
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+            uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def idempotent(endpoint):
+    """
+    دعم الترويسة Idempotency-Key لعمليات الكتابة
+    - المفتاح خاص بصاحبه (المستخدم، أو الجلسة بدون تسجيل دخول): نفس المفتاح من مستخدم آخر طلب مستقل
+    - نفس المفتاح ونفس المحتوى: تُرجع الاستجابة المحفوظة (استعلام واحد على فهرس فريد) بدون تنفيذ الـ view
+    - نفس المفتاح بمحتوى مختلف: 422 (رفع الملفات يُقارن بتجزئة متدفقة للملف - انظر _request_fingerprint)
+    - تُحفظ الاستجابات الناجحة فقط (انظر _is_success): الفشل (مخزون غير كافٍ، خطأ تحقق، خطأ خادم)
+      لا يُحفظ مهما كان محرك الخصم، فإعادة المحاولة بنفس المفتاح تنفذ العملية من جديد
+    - يجب أن يكون داخل transaction.atomic: المفتاح يُحجز في نفس معاملة العملية،
+      فإذا أُلغيت المعاملة يختفي المفتاح ويمكن إعادة المحاولة، والطلب المتزامن بنفس المفتاح ينتظر ثم يُرجع النتيجة
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            from .models import IdempotencyKey
+            
+            key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+            if not key:
+                return view_func(request, *args, **kwargs)
+            if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return JsonResponse({'success': False, 'error': 'مفتاح Idempotency-Key طويل جداً'}, status=400)
+            
+            scope = _idempotency_scope(request)
+            request_hash = _request_fingerprint(request)
+            now = timezone.now()
+            
+            def replay_or_conflict(record):
+                if record.request_hash != request_hash:
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'مفتاح Idempotency-Key مستخدم مسبقاً لطلب مختلف'
+                    }, status=422)
+                return _replay_response(record)
+            
+            record = IdempotencyKey.objects.filter(endpoint=endpoint, scope=scope, key=key).first()
+            if record is not None:
+                if record.expires_at > now:
+                    return replay_or_conflict(record)
+                record.delete()
+            
+            # حجز المفتاح - الطلب المتزامن بنفس المفتاح ينتظر على الفهرس الفريد حتى تنتهي معاملتنا
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        endpoint=endpoint,
+                        scope=scope,
+                        key=key,
+                        request_hash=request_hash,
+                        user=request.user.username if request.user.is_authenticated else 'Guest',
+                        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+                    )
+            except IntegrityError:
+                return replay_or_conflict(IdempotencyKey.objects.get(endpoint=endpoint, scope=scope, key=key))
+            
+            response = view_func(request, *args, **kwargs)
+            
+            # المعاملة ستُلغى (ومعها المفتاح) - لا يمكن تنفيذ استعلامات
+            if transaction.get_rollback():
+                return response
+            
+            if response.streaming or not _is_success(response):
+                # الفشل لا يُحفظ - يمكن إعادة المحاولة بنفس المفتاح
+                record.delete()
+            else:
+                record.status_code = response.status_code
+                record.response_body = response.content.decode(response.charset or 'utf-8')
+                record.content_type = response.get('Content-Type', 'application/json')
+                record.save(update_fields=['status_code', 'response_body', 'content_type'])
+            return response
+        return _wrapped_view
+    return decorator
+
+
 def get_user_type(user):
     """الحصول على نوع المستخدم"""
     if not user.is_authenticated:
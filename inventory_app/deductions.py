@@ -0,0 +1,260 @@
+"""
+خصم الكميات عند تأكيد الطلبيات (مسار جماعي)
+1. التحقق من جميع الأسطر في الذاكرة - لا كتابة إذا فشل أي سطر
+2. خصم جميع الكميات بعبارة واحدة وسجلات العمليات بـ bulk_create واحد
+عدد الاستعلامات ثابت مهما كان طول القائمة
+
+محركان يُختاران بالإعداد DEDUCTION_ENGINE:
+- locking (الافتراضي): select_for_update ثم حساب الكميات في Python ثم bulk_update
+- conditional: UPDATE مشروط (quantity >= المطلوب) مع RETURNING بدون قراءة مسبقة،
+  فلا تُقفل الصفوف أثناء تنفيذ كود Python - أنسب لعدة موظفين يسحبون نفس المنتجات معاً
+
+إعادة الكميات (المرتجعات - apply_restock): UPDATE واحد يضيف الكميات مع RETURNING
+فمدة قفل الصفوف وعدد الاستعلامات لا يزيدان مع عدد الأسطر
+
+الكتابة الجماعية لا ترسل post_save، فتفريغ فهرس البحث يتم هنا داخل apply_deductions و apply_restock
+(وليس في كل view يستدعيهما) - يُجمع مع باقي تعديلات المعاملة ويرفع إصدار المنتجات مرة واحدة عند الالتزام
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Product, AuditLog
+from .product_cache import product_cache
+
+
+ENGINE_LOCKING = 'locking'
+ENGINE_CONDITIONAL = 'conditional'
+ENGINES = (ENGINE_LOCKING, ENGINE_CONDITIONAL)
+
+# خصم مشروط لكل المنتجات بعبارة واحدة (PostgreSQL و SQLite >= 3.35)
+# المنتج الذي لا يكفي مخزونه لا يُحدَّث ولا يظهر في RETURNING
+CONDITIONAL_UPDATE_SQL = """
+    WITH v(code, qty) AS (VALUES {values})
+    UPDATE inventory_app_product
+    SET quantity = quantity - v.qty,
+        updated_at = CASE WHEN v.qty > 0 THEN %s ELSE updated_at END
+    FROM v
+    WHERE product_number = v.code AND quantity >= v.qty
+    RETURNING id, product_number, quantity
+"""
+
+
+# إضافة الكميات المرتجعة لكل المنتجات بعبارة واحدة
+# updated_at لا يتغير (كما في save(update_fields=['quantity']) السابق) - ترتيب القوائم والتصدير يعتمد عليه
+RESTOCK_UPDATE_SQL = """
+    WITH v(code, qty) AS (VALUES {values})
+    UPDATE inventory_app_product
+    SET quantity = quantity + v.qty
+    FROM v
+    WHERE product_number = v.code
+    RETURNING id, product_number, name, quantity
+"""
+
+
+class DeductionError(Exception):
+    """فشل التحقق من سطر أو أكثر - لم يُكتب شيء"""
+
+    def __init__(self, errors):
+        super().__init__(errors[0])
+        self.errors = errors
+
+
+def get_engine():
+    """المحرك المحدد في إعدادات النشر"""
+    engine = getattr(settings, 'DEDUCTION_ENGINE', ENGINE_LOCKING)
+    if engine not in ENGINES:
+        raise ValueError(f'DEDUCTION_ENGINE غير معروف: {engine}')
+    return engine
+
+
+def apply_deductions(lines, username, engine=None):
+    """
+    خصم الكميات لقائمة أسطر [(رقم المنتج، الكمية المطلوبة)]
+    يعيد قائمة updated_products (نفس صيغة Order.products_data)
+    يرفع DeductionError بكل الأخطاء إذا فشل أي سطر
+    يجب استدعاؤها داخل transaction.atomic
+    """
+    if not lines:
+        return []
+
+    errors = [
+        f'الكمية غير صالحة للمنتج {number}'
+        for number, quantity in lines if quantity < 0
+    ]
+    if errors:
+        raise DeductionError(errors)
+
+    # مجموع المطلوب لكل منتج (نفس المنتج قد يتكرر في أكثر من سطر)
+    totals = OrderedDict()
+    for number, quantity in lines:
+        totals[number] = totals.get(number, 0) + quantity
+
+    engine = engine or get_engine()
+    if engine == ENGINE_CONDITIONAL:
+        before = _deduct_conditional(totals)
+    else:
+        before = _deduct_locking(totals)
+
+    product_cache.discard_products(before[number][0] for number, total in totals.items() if total)
+
+    return _record_lines(lines, before, username)
+
+
+def _deduct_locking(totals):
+    """قفل المنتجات ثم التحقق والخصم - يعيد {رقم: (المعرف، الكمية قبل)}"""
+    products_dict = {
+        p.product_number: p
+        for p in Product.objects.filter(product_number__in=[n for n in totals if n]).select_for_update()
+    }
+
+    errors = []
+    for number, total in totals.items():
+        product = products_dict.get(number)
+        if not product:
+            errors.append(f'المنتج {number} غير موجود')
+        elif product.quantity < total:
+            errors.append(f'الكمية غير كافية للمنتج {number}')
+    if errors:
+        raise DeductionError(errors)
+
+    before = {number: (products_dict[number].id, products_dict[number].quantity) for number in totals}
+
+    changed_products = []
+    now = timezone.now()  # bulk_update لا يطبق auto_now
+    for number, total in totals.items():
+        if total:
+            product = products_dict[number]
+            product.quantity -= total
+            product.updated_at = now
+            changed_products.append(product)
+    if changed_products:
+        Product.objects.bulk_update(changed_products, ['quantity', 'updated_at'])
+
+    return before
+
+
+def _deduct_conditional(totals):
+    """خصم مشروط بعبارة واحدة - يعيد {رقم: (المعرف، الكمية قبل)}"""
+    # ترتيب ثابت للأرقام يقلل احتمال التعارض (deadlock) بين طلبين متزامنين
+    numbers = sorted(totals)
+    params = []
+    for number in numbers:
+        params.extend([number, totals[number]])
+    params.append(connection.ops.adapt_datetimefield_value(timezone.now()))
+    sql = CONDITIONAL_UPDATE_SQL.format(values=', '.join(['(%s, %s)'] * len(numbers)))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        updated = {number: (product_id, quantity) for product_id, number, quantity in cursor.fetchall()}
+
+    missing = [number for number in totals if number not in updated]
+    if missing:
+        # تحديد السبب لكل سطر فاشل - المعاملة ستُلغى فلا يبقى أي خصم
+        existing = set(Product.objects.filter(product_number__in=missing).values_list('product_number', flat=True))
+        transaction.set_rollback(True)
+        raise DeductionError([
+            f'الكمية غير كافية للمنتج {number}' if number in existing else f'المنتج {number} غير موجود'
+            for number in missing
+        ])
+
+    return {number: (product_id, quantity + totals[number]) for number, (product_id, quantity) in updated.items()}
+
+
+def _record_lines(lines, before, username):
+    """بناء نتائج الأسطر وسجلات العمليات بالتتابع ثم حفظها بـ bulk_create واحد"""
+    current = {number: quantity for number, (_, quantity) in before.items()}
+    updated_products = []
+    audit_logs = []
+
+    for product_number, requested_quantity in lines:
+        old_quantity = current[product_number]
+        new_quantity = old_quantity - requested_quantity
+        current[product_number] = new_quantity
+
+        audit_logs.append(AuditLog(
+            action='quantity_taken',
+            product_id=before[product_number][0],
+            product_number=product_number,
+            quantity_before=old_quantity,
+            quantity_after=new_quantity,
+            quantity_change=-requested_quantity,
+            # إذا كانت الكمية المطلوبة 0، نسجل العملية فقط بدون خصم
+            notes=f'تم سحب {requested_quantity} من المنتج' if requested_quantity else 'تم البحث عن المنتج بدون سحب كمية (كمية 0)',
+            user=username,
+        ))
+
+        updated_products.append({
+            'product_number': product_number,
+            'old_quantity': old_quantity,
+            'new_quantity': new_quantity,
+            'quantity_taken': requested_quantity,
+        })
+
+    AuditLog.objects.bulk_create(audit_logs)
+    return updated_products
+
+
+def apply_restock(lines, username, note='إرجاع {quantity} من المرتجع'):
+    """
+    إضافة الكميات المرتجعة لقائمة أسطر [(رقم المنتج، الكمية)] بعبارة UPDATE واحدة
+    يعيد (أسطر المرتجع بصيغة ProductReturn.products_data، {رقم المنتج: المعرف})
+    يرفع DeductionError إذا لم يوجد منتج أو أكثر - يجب استدعاؤها داخل transaction.atomic
+    """
+    if not lines:
+        return [], {}
+
+    totals = OrderedDict()
+    for number, quantity in lines:
+        totals[number] = totals.get(number, 0) + quantity
+
+    # ترتيب ثابت للأرقام يقلل احتمال التعارض (deadlock) بين طلبين متزامنين
+    numbers = sorted(totals)
+    params = []
+    for number in numbers:
+        params.extend([number, totals[number]])
+    sql = RESTOCK_UPDATE_SQL.format(values=', '.join(['(%s, %s)'] * len(numbers)))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        updated = {number: (product_id, name, quantity) for product_id, number, name, quantity in cursor.fetchall()}
+
+    missing = [number for number in totals if number not in updated]
+    if missing:
+        transaction.set_rollback(True)
+        raise DeductionError([f'المنتج {number} غير موجود' for number in missing])
+
+    product_ids = {number: product_id for number, (product_id, _, _) in updated.items()}
+    product_cache.discard_products(product_ids.values())
+
+    # الكمية قبل المرتجع = بعده - مجموع المضاف، ثم نحسب كل سطر بالتتابع
+    current = {number: quantity - totals[number] for number, (_, _, quantity) in updated.items()}
+    return_lines = []
+    audit_logs = []
+    for number, quantity in lines:
+        old_quantity = current[number]
+        new_quantity = old_quantity + quantity
+        current[number] = new_quantity
+
+        audit_logs.append(AuditLog(
+            action='quantity_added',
+            product_id=product_ids[number],
+            product_number=number,
+            quantity_before=old_quantity,
+            quantity_after=new_quantity,
+            quantity_change=quantity,
+            notes=note.format(quantity=quantity),
+            user=username,
+        ))
+        return_lines.append({
+            'product_number': number,
+            'product_name': updated[number][1],
+            'quantity_before': old_quantity,
+            'quantity_returned': quantity,
+            'quantity_after': new_quantity,
+        })
+
+    AuditLog.objects.bulk_create(audit_logs)
+    return return_lines, product_ids
@@ -0,0 +1,73 @@
+"""
+أرقام المستندات (الطلبيات والمرتجعات والدفعات)
+- الصيغة: PREFIX-00000042 (عداد متصل) أو PREFIX-YYYYMMDD-0042 (عداد يومي)
+  تزداد دائماً بترتيب الإصدار ويمكن ترتيبها نصياً، والصيغتان لا تتعارضان عند تغيير الإعداد
+- العداد المتصل على PostgreSQL: تسلسل (SEQUENCE) لكل بادئة يُنشأ في migration (0021) وليس أثناء الطلب -
+  nextval لا يقفل أي صف ولا ينتظر انتهاء معاملات أخرى، والرقم لا يُعاد بعد إلغاء المعاملة (فجوات مقبولة)
+- العداد اليومي (DOCUMENT_NUMBER_RESET_DAILY) وباقي قواعد البيانات (SQLite للتطوير): صف في جدول DocumentCounter
+  لكل بادئة (ويوم) يُنشأ أو يُزاد بعبارة INSERT ... ON CONFLICT DO UPDATE ... RETURNING واحدة داخل نفس المعاملة
+  (صف صغير لكل يوم بدلاً من تسلسل جديد كل يوم لا يُحذف - قفل الصف يبقى حتى نهاية المعاملة)
+- allocate_numbers: حجز كتلة أرقام بعبارة واحدة للدفعات وقوائم الانتظار
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import DocumentCounter
+
+
+ORDER = 'ORD'
+RETURN = 'RET'
+WAVE = 'WAVE'
+
+# البادئات التي لها تسلسل على PostgreSQL (انظر migration 0021) - غيرها يستخدم DocumentCounter
+SEQUENCE_PREFIXES = (ORDER, RETURN, WAVE)
+
+NUMBER_WIDTH = 8
+DAILY_NUMBER_WIDTH = 4
+SEQUENCE_PREFIX = 'inventory_docnum_'
+
+# حجز count رقماً من العداد بعبارة واحدة (PostgreSQL و SQLite >= 3.35) - يعيد آخر رقم محجوز
+COUNTER_UPSERT_SQL = f"""
+    INSERT INTO {DocumentCounter._meta.db_table} (name, value) VALUES (%s, %s)
+    ON CONFLICT (name) DO UPDATE SET value = {DocumentCounter._meta.db_table}.value + excluded.value
+    RETURNING value
+"""
+
+
+def _allocate_sequence(name, count):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(%s) FROM generate_series(1, %s) ORDER BY 1',
+            [(SEQUENCE_PREFIX + name).lower(), count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _allocate_counter(name, count):
+    with connection.cursor() as cursor:
+        cursor.execute(COUNTER_UPSERT_SQL, [name, count])
+        last = cursor.fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+def allocate_numbers(prefix, count):
+    """حجز count رقماً متزايداً للبادئة prefix (مثل ORD) - يعيد قائمة نصوص"""
+    if count <= 0:
+        return []
+    if getattr(settings, 'DOCUMENT_NUMBER_RESET_DAILY', False):
+        label = f"{prefix}-{timezone.localdate().strftime('%Y%m%d')}"
+        values = _allocate_counter(label.replace('-', '_'), count)
+        width = DAILY_NUMBER_WIDTH
+    elif connection.vendor == 'postgresql' and prefix in SEQUENCE_PREFIXES:
+        label, width = prefix, NUMBER_WIDTH
+        values = _allocate_sequence(prefix, count)
+    else:
+        label, width = prefix, NUMBER_WIDTH
+        values = _allocate_counter(prefix, count)
+    return [f"{label}-{value:0{width}d}" for value in values]
+
+
+def next_number(prefix):
+    """رقم مستند واحد"""
+    return allocate_numbers(prefix, 1)[0]
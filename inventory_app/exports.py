@@ -0,0 +1,139 @@
+"""
+تصدير الطلبيات والمرتجعات للمطابقة مع نظام ERP
+- سطر لكل منتج في products_data (وليس سطراً لكل طلبية)
+- القراءة بـ .iterator(chunk_size) فتبقى الذاكرة ثابتة مهما كان عدد الأسطر
+- CSV: بث مباشر (StreamingHttpResponse)
+- XLSX: openpyxl بوضع write_only إلى ملف مؤقت على القرص ثم إرساله (FileResponse)
+- فلترة التاريخ بنطاق على created_at بنفس ترتيب الفهرس -created_at
+"""
+import csv
+import tempfile
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import Order, ProductReturn
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_HEADERS = [
+    'رقم الطلبية', 'التاريخ', 'المستلم', 'المستخدم',
+    'رقم المنتج', 'الكمية المسحوبة', 'الكمية قبل', 'الكمية بعد',
+]
+RETURN_HEADERS = [
+    'رقم المرتجع', 'التاريخ', 'اسم المرسل', 'سبب الإرجاع', 'المستخدم',
+    'رقم المنتج', 'اسم المنتج', 'الكمية المرتجعة', 'الكمية قبل', 'الكمية بعد',
+]
+
+
+class EchoBuffer:
+    """كائن كتابة لـ csv.writer يعيد السطر بدلاً من تخزينه (للبث)"""
+    def write(self, value):
+        return value
+
+
+def parse_date_range(params):
+    """
+    قراءة from / to (YYYY-MM-DD) من الطلب - يعيد (بداية، نهاية غير شاملة) أو None لكل طرف
+    يرفع ValueError إذا كان التاريخ غير صالح
+    """
+    def day_start(value):
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    start = params.get('from', '').strip()
+    end = params.get('to', '').strip()
+    start = day_start(start) if start else None
+    # "إلى" شامل لليوم كاملاً
+    end = day_start(end) + timedelta(days=1) if end else None
+    if start and end and start >= end:
+        raise ValueError('تاريخ البداية بعد تاريخ النهاية')
+    return start, end
+
+
+def _in_range(queryset, start, end):
+    if start:
+        queryset = queryset.filter(created_at__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset.order_by('-created_at', '-id')
+
+
+def _local(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def order_rows(start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """أسطر الطلبيات: سطر لكل منتج"""
+    orders = _in_range(Order.objects.all(), start, end).values_list(
+        'order_number', 'created_at', 'recipient_name', 'user', 'products_data'
+    )
+    for order_number, created_at, recipient_name, user, products_data in orders.iterator(chunk_size=chunk_size):
+        created = _local(created_at)
+        for line in products_data or []:
+            yield [
+                order_number, created, recipient_name or '', user,
+                line.get('product_number', ''),
+                line.get('quantity_taken', ''),
+                line.get('old_quantity', ''),
+                line.get('new_quantity', ''),
+            ]
+
+
+def return_rows(start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """أسطر المرتجعات: سطر لكل منتج"""
+    returns = _in_range(ProductReturn.objects.all(), start, end).values_list(
+        'return_number', 'created_at', 'returned_by', 'return_reason', 'user', 'products_data'
+    )
+    for return_number, created_at, returned_by, return_reason, user, products_data in returns.iterator(chunk_size=chunk_size):
+        created = _local(created_at)
+        for line in products_data or []:
+            yield [
+                return_number, created, returned_by or '', return_reason or '', user,
+                line.get('product_number', ''),
+                line.get('product_name', ''),
+                line.get('quantity_returned', ''),
+                line.get('quantity_before', ''),
+                line.get('quantity_after', ''),
+            ]
+
+
+def stream_csv(headers, rows):
+    """توليد ملف CSV سطراً بسطر"""
+    writer = csv.writer(EchoBuffer())
+    yield '\ufeff' + writer.writerow(headers)  # BOM ليفتح Excel النص العربي بشكل صحيح
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(title, headers, rows):
+    """
+    كتابة XLSX بوضع write_only (الأسطر تُكتب إلى القرص مباشرة ولا تبقى في الذاكرة)
+    يعيد ملفاً مؤقتاً مفتوحاً من بدايته - يُحذف تلقائياً عند إغلاقه
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title)
+    ws.sheet_view.rightToLeft = True
+
+    header_font = Font(name='Arial', size=12, bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for row in rows:
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
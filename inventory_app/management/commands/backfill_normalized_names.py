@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from inventory_app.arabic import backfill_normalized_names
+from inventory_app.models import Product
+
+
+class Command(BaseCommand):
+    help = 'حساب الاسم الموحد للبحث (name_normalized) للمنتجات الموجودة على دفعات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='عدد المنتجات في كل دفعة'
+        )
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help='معالجة المنتجات التي ليس لها اسم موحد فقط'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('بدء حساب الأسماء الموحدة...'))
+        
+        updated = backfill_normalized_names(
+            Product,
+            chunk_size=options['chunk_size'],
+            only_missing=options['only_missing'],
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f'✓ تم تحديث {updated} منتج'))
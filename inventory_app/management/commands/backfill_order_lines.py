@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from inventory_app.models import Order, ProductReturn
+from inventory_app.order_lines import backfill_lines, BACKFILL_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'بناء أسطر الطلبيات والمرتجعات (OrderLine / ReturnLine) من products_data على دفعات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=BACKFILL_CHUNK_SIZE,
+            help='عدد الطلبيات/المرتجعات في كل دفعة'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='إعادة بناء أسطر جميع السجلات (وليس الناقصة فقط)'
+        )
+
+    def handle(self, *args, **options):
+        only_missing = not options['rebuild']
+        
+        for model, label in ((Order, 'طلبية'), (ProductReturn, 'مرتجع')):
+            self.stdout.write(self.style.WARNING(f'معالجة {model._meta.verbose_name_plural}...'))
+            parents, lines = backfill_lines(model, chunk_size=options['chunk_size'], only_missing=only_missing)
+            self.stdout.write(self.style.SUCCESS(f'✓ {parents} {label} - {lines} سطر'))
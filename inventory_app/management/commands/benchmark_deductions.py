@@ -0,0 +1,94 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction, OperationalError
+
+from inventory_app.deductions import apply_deductions, DeductionError, ENGINES
+from inventory_app.models import Product, AuditLog
+
+
+BENCH_PREFIX = 'BENCH-'
+
+
+class Command(BaseCommand):
+    help = 'قياس زمن تأكيد الطلبيات تحت التزاحم (عدة موظفين على نفس المنتجات) لكل محرك خصم'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', choices=ENGINES + ('all',), default='all', help='المحرك المراد قياسه')
+        parser.add_argument('--workers', type=int, default=8, help='عدد العمليات المتزامنة')
+        parser.add_argument('--iterations', type=int, default=50, help='عدد الطلبيات لكل عملية')
+        parser.add_argument('--lines', type=int, default=20, help='عدد الأسطر في كل طلبية')
+        parser.add_argument('--products', type=int, default=40, help='عدد المنتجات المشتركة (أقل = تزاحم أعلى)')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('تحذير: SQLite يسمح بكاتب واحد فقط - النتائج لا تمثل PostgreSQL'))
+        if options['lines'] > options['products']:
+            raise CommandError('--lines يجب ألا يتجاوز --products')
+
+        engines = ENGINES if options['engine'] == 'all' else (options['engine'],)
+        try:
+            for engine in engines:
+                self._create_products(options['products'])
+                latencies, failures = self._run(engine, options)
+                self._report(engine, latencies, failures)
+        finally:
+            self._cleanup()
+
+    def _create_products(self, count):
+        self._cleanup()
+        Product.objects.bulk_create([
+            Product(product_number=f'{BENCH_PREFIX}{i:05d}', name=f'منتج قياس {i}', quantity=10 ** 9)
+            for i in range(count)
+        ])
+
+    def _cleanup(self):
+        AuditLog.objects.filter(product_number__startswith=BENCH_PREFIX).delete()
+        Product.objects.filter(product_number__startswith=BENCH_PREFIX).delete()
+
+    def _run(self, engine, options):
+        numbers = [f'{BENCH_PREFIX}{i:05d}' for i in range(options['products'])]
+        latencies = []
+        failures = []
+        barrier = threading.Barrier(options['workers'])
+
+        def worker():
+            rng = random.Random()
+            barrier.wait()
+            try:
+                for _ in range(options['iterations']):
+                    lines = [(number, rng.randint(1, 3)) for number in rng.sample(numbers, options['lines'])]
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            apply_deductions(lines, 'benchmark', engine=engine)
+                    except (DeductionError, OperationalError) as e:
+                        failures.append(str(e))
+                        continue
+                    latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, failures
+
+    def _report(self, engine, latencies, failures):
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'{engine}: لم تنجح أي طلبية ({len(failures)} فشل)'))
+            return
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(self.style.SUCCESS(
+            f'{engine}: {len(latencies)} طلبية | '
+            f'p50={statistics.median(latencies):.1f}ms '
+            f'p99={p99:.1f}ms '
+            f'max={latencies[-1]:.1f}ms | '
+            f'فشل={len(failures)}'
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from inventory_app.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'حذف مفاتيح Idempotency-Key المنتهية الصلاحية على دفعات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='عدد المفاتيح المحذوفة في كل دفعة'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        now = timezone.now()
+        deleted = 0
+        
+        # الحذف على دفعات يبقي كل معاملة قصيرة (فهرس expires_at)
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now)
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            count, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+            deleted += count
+        
+        self.stdout.write(self.style.SUCCESS(f'✓ تم حذف {deleted} مفتاح منتهي الصلاحية'))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from inventory_app.confirmation_queue import process_pending_jobs, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'تنفيذ طلبات تأكيد الطلبيات المنتظرة على دفعات (يمكن تشغيل أكثر من منفذ معاً)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='عدد الطلبات المحجوزة في كل دفعة'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='الاستمرار في انتظار طلبات جديدة بدلاً من التوقف عند فراغ القائمة'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.5,
+            help='الانتظار بالثواني عند فراغ القائمة (مع --loop)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total_done = total_failed = 0
+
+        try:
+            while True:
+                done, failed = process_pending_jobs(batch_size)
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    self.stdout.write(f'دفعة: {done} ناجح، {failed} فاشل')
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ تم تنفيذ {total_done} طلب، فشل {total_failed}'
+        ))
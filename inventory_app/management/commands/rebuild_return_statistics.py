@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from inventory_app.return_statistics import rebuild_return_statistics, REBUILD_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء عدادات المرتجعات (ReturnStatistics) من جدول المرتجعات على دفعات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help='نطاق معرفات المرتجعات في كل استعلام تجميعي'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('إعادة بناء إحصائيات المرتجعات...'))
+        count = rebuild_return_statistics(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} مرتجع'))
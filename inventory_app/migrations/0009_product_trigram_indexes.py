@@ -0,0 +1,40 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# فهارس pg_trgm للبحث في المنتجات (PostgreSQL فقط)
+# - UPPER(...) يطابق ما يولده Django لـ icontains / istartswith
+# - name بدون UPPER يخدم معامل التشابه %
+TRIGRAM_INDEXES = [
+    ('inventory_a_prod_num_trgm_idx', 'UPPER("product_number"::text) gin_trgm_ops'),
+    ('inventory_a_prod_name_up_trgm_idx', 'UPPER("name"::text) gin_trgm_ops'),
+    ('inventory_a_prod_name_trgm_idx', '"name" gin_trgm_ops'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "inventory_app_product" USING gin ({expression})'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0008_productreturn'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations, models
+
+
+# فهرس trigram على الاسم الموحد يحل محل فهارس عمود الاسم من 0009 (PostgreSQL فقط)
+NORMALIZED_INDEX = ('inventory_a_prod_name_norm_trgm_idx', '"name_normalized" gin_trgm_ops')
+REPLACED_INDEXES = [
+    ('inventory_a_prod_name_up_trgm_idx', 'UPPER("name"::text) gin_trgm_ops'),
+    ('inventory_a_prod_name_trgm_idx', '"name" gin_trgm_ops'),
+]
+
+
+def backfill_names(apps, schema_editor):
+    from inventory_app.arabic import backfill_normalized_names
+
+    Product = apps.get_model('inventory_app', 'Product')
+    backfill_normalized_names(Product)
+
+
+def create_normalized_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    name, expression = NORMALIZED_INDEX
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{name}" ON "inventory_app_product" USING gin ({expression})'
+    )
+    for name, _ in REPLACED_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def drop_normalized_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, expression in REPLACED_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "inventory_app_product" USING gin ({expression})'
+        )
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{NORMALIZED_INDEX[0]}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0009_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='name_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200, verbose_name='الاسم الموحد للبحث'),
+        ),
+        migrations.RunPython(backfill_names, migrations.RunPython.noop),
+        migrations.RunPython(create_normalized_index, drop_normalized_index),
+    ]
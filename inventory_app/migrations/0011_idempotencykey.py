@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0010_product_name_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=100, verbose_name='العملية')),
+                ('key', models.CharField(max_length=255, verbose_name='المفتاح')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='بصمة الطلب')),
+                ('status_code', models.IntegerField(default=0, verbose_name='رمز الاستجابة')),
+                ('response_body', models.TextField(blank=True, default='', verbose_name='محتوى الاستجابة')),
+                ('content_type', models.CharField(blank=True, default='application/json', max_length=100, verbose_name='نوع المحتوى')),
+                ('user', models.CharField(blank=True, default='Guest', max_length=100, verbose_name='المستخدم')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('expires_at', models.DateTimeField(verbose_name='تاريخ الانتهاء')),
+            ],
+            options={
+                'verbose_name': 'مفتاح تكرار آمن',
+                'verbose_name_plural': 'مفاتيح التكرار الآمن',
+                'indexes': [models.Index(fields=['expires_at'], name='inventory_a_expires_a192be_idx')],
+                'unique_together': {('endpoint', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReturnLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='الترتيب')),
+                ('product_number', models.CharField(max_length=100, verbose_name='رقم المنتج')),
+                ('product_name', models.CharField(blank=True, max_length=200, null=True, verbose_name='اسم المنتج')),
+                ('quantity_returned', models.IntegerField(default=0, verbose_name='الكمية المرتجعة')),
+                ('quantity_before', models.IntegerField(blank=True, null=True, verbose_name='الكمية قبل')),
+                ('quantity_after', models.IntegerField(blank=True, null=True, verbose_name='الكمية بعد')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الإنشاء')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='return_lines', to='inventory_app.product', verbose_name='المنتج')),
+                ('product_return', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory_app.productreturn', verbose_name='المرتجع')),
+            ],
+            options={
+                'verbose_name': 'سطر مرتجع',
+                'verbose_name_plural': 'أسطر المرتجعات',
+                'ordering': ['product_return', 'position'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='inventory_a_product_1f0d12_idx'), models.Index(fields=['product_number'], name='inventory_a_product_0a266d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='الترتيب')),
+                ('product_number', models.CharField(max_length=100, verbose_name='رقم المنتج')),
+                ('quantity_taken', models.IntegerField(default=0, verbose_name='الكمية المسحوبة')),
+                ('old_quantity', models.IntegerField(blank=True, null=True, verbose_name='الكمية قبل')),
+                ('new_quantity', models.IntegerField(blank=True, null=True, verbose_name='الكمية بعد')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الإنشاء')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory_app.order', verbose_name='الطلبية')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_lines', to='inventory_app.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'سطر طلبية',
+                'verbose_name_plural': 'أسطر الطلبيات',
+                'ordering': ['order', 'position'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='inventory_a_product_feeeca_idx'), models.Index(fields=['product_number'], name='inventory_a_product_6a1ce3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:31
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0012_orderline_returnline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfirmationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='رقم التذكرة')),
+                ('status', models.CharField(choices=[('pending', 'في الانتظار'), ('done', 'تم'), ('failed', 'فشل')], default='pending', max_length=10, verbose_name='الحالة')),
+                ('payload', models.JSONField(default=dict, verbose_name='بيانات الطلب')),
+                ('user', models.CharField(blank=True, default='Guest', max_length=100, verbose_name='المستخدم')),
+                ('order_number', models.CharField(blank=True, max_length=50, null=True, verbose_name='رقم الطلبية')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='النتيجة')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ التنفيذ')),
+            ],
+            options={
+                'verbose_name': 'طلب تأكيد في الانتظار',
+                'verbose_name_plural': 'طلبات التأكيد في الانتظار',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='inventory_a_status_3bbb87_idx')],
+            },
+        ),
+    ]
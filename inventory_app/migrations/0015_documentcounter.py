@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0014_order_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='اسم العداد')),
+                ('value', models.BigIntegerField(default=0, verbose_name='آخر رقم')),
+            ],
+            options={
+                'verbose_name': 'عداد أرقام المستندات',
+                'verbose_name_plural': 'عدادات أرقام المستندات',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0015_documentcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productreturn',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='returns', to='inventory_app.order', verbose_name='الطلبية'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:41
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_statistics(apps, schema_editor):
+    """تعبئة العدادات من المرتجعات الموجودة (استعلام تجميعي واحد حسب اليوم)"""
+    ProductReturn = apps.get_model('inventory_app', 'ProductReturn')
+    ReturnStatistics = apps.get_model('inventory_app', 'ReturnStatistics')
+
+    rows = (
+        ProductReturn.objects.annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(returns_count=Count('id'), quantities_total=Sum('total_quantities'))
+        .order_by()
+    )
+    statistics = [
+        ReturnStatistics(
+            period=row['day'].isoformat(),
+            returns_count=row['returns_count'],
+            quantities_total=row['quantities_total'] or 0,
+        )
+        for row in rows
+    ]
+    statistics.append(ReturnStatistics(
+        period='all',
+        returns_count=sum(row.returns_count for row in statistics),
+        quantities_total=sum(row.quantities_total for row in statistics),
+    ))
+    ReturnStatistics.objects.bulk_create(statistics, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0016_productreturn_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReturnStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=10, unique=True, verbose_name='الفترة')),
+                ('returns_count', models.BigIntegerField(default=0, verbose_name='عدد المرتجعات')),
+                ('quantities_total', models.BigIntegerField(default=0, verbose_name='إجمالي الكميات المرتجعة')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+            options={
+                'verbose_name': 'إحصائيات المرتجعات',
+                'verbose_name_plural': 'إحصائيات المرتجعات',
+            },
+        ),
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0017_returnstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='اسم العداد')),
+                ('version', models.BigIntegerField(default=0, verbose_name='الإصدار')),
+            ],
+            options={
+                'verbose_name': 'إصدار البيانات',
+                'verbose_name_plural': 'إصدارات البيانات',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0018_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductNumberChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_number', models.CharField(blank=True, max_length=100, null=True, verbose_name='رقم المنتج')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='وقت التغيير')),
+            ],
+            options={
+                'verbose_name': 'تغيير رقم منتج',
+                'verbose_name_plural': 'تغييرات أرقام المنتجات',
+            },
+        ),
+    ]
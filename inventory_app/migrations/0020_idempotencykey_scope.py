@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0019_productnumberchange'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='idempotencykey',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='scope',
+            field=models.CharField(default='', max_length=100, verbose_name='النطاق'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='idempotencykey',
+            unique_together={('endpoint', 'scope', 'key')},
+        ),
+    ]
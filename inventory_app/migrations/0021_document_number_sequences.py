@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:10
+
+from django.db import migrations
+
+
+SEQUENCE_PREFIX = 'inventory_docnum_'
+# نسخة ثابتة من document_numbers.SEQUENCE_PREFIXES وقت كتابة الـ migration
+PREFIXES = ('ORD', 'RET', 'WAVE')
+
+
+def create_sequences(apps, schema_editor):
+    """
+    إنشاء تسلسلات العداد المتصل هنا بدلاً من CREATE SEQUENCE أثناء الطلب
+    وتحويل التسلسلات اليومية (تسلسل لكل بادئة ويوم) إلى صفوف DocumentCounter ثم حذفها
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    DocumentCounter = apps.get_model('inventory_app', 'DocumentCounter')
+
+    with schema_editor.connection.cursor() as cursor:
+        for prefix in PREFIXES:
+            cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_PREFIX}{prefix.lower()}')
+
+        cursor.execute(
+            "SELECT sequencename, last_value FROM pg_sequences "
+            "WHERE schemaname = current_schema() AND sequencename ~ %s",
+            [f'^{SEQUENCE_PREFIX}[a-z]+_[0-9]{{8}}$'],
+        )
+        for sequence, last_value in cursor.fetchall():
+            name = sequence[len(SEQUENCE_PREFIX):].upper()
+            counter, _ = DocumentCounter.objects.get_or_create(name=name)
+            if (last_value or 0) > counter.value:
+                counter.value = last_value
+                counter.save(update_fields=['value'])
+            cursor.execute(f'DROP SEQUENCE {sequence}')
+
+
+def drop_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for prefix in PREFIXES:
+            cursor.execute(f'DROP SEQUENCE IF EXISTS {SEQUENCE_PREFIX}{prefix.lower()}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0020_idempotencykey_scope'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequences, drop_sequences),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:14
+
+from django.db import migrations
+from django.db.models import Sum
+
+
+ALL_TIME = 'all'
+
+
+def remove_total_row(apps, schema_editor):
+    """الإجمالي أصبح مجموع صفوف الأيام - حذف صف all الذي كانت تقفله كل معاملة مرتجع"""
+    ReturnStatistics = apps.get_model('inventory_app', 'ReturnStatistics')
+    ReturnStatistics.objects.filter(period=ALL_TIME).delete()
+
+
+def restore_total_row(apps, schema_editor):
+    ReturnStatistics = apps.get_model('inventory_app', 'ReturnStatistics')
+    totals = ReturnStatistics.objects.aggregate(returns_count=Sum('returns_count'), quantities_total=Sum('quantities_total'))
+    ReturnStatistics.objects.create(
+        period=ALL_TIME,
+        returns_count=totals['returns_count'] or 0,
+        quantities_total=totals['quantities_total'] or 0,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0021_document_number_sequences'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_total_row, restore_total_row),
+    ]
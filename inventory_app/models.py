@@ -1,8 +1,12 @@
+import uuid
+
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .arabic import normalize_arabic
+
 
 class Warehouse(models.Model):
     """نموذج المستودع - يحتوي على معلومات المستودع"""
@@ -75,6 +79,8 @@ class Product(models.Model):
     """نموذج المنتج - يمثل منتجاً في المستودع"""
     product_number = models.CharField(max_length=100, unique=True, verbose_name='رقم المنتج', db_index=True)
     name = models.CharField(max_length=200, verbose_name='اسم المنتج')
+    # الاسم بعد توحيد الحروف العربية وحذف التشكيل - يُحسب تلقائياً عند الحفظ ويُستخدم في البحث
+    name_normalized = models.CharField(max_length=200, blank=True, default='', editable=False, verbose_name='الاسم الموحد للبحث')
     category = models.CharField(max_length=100, blank=True, null=True, verbose_name='الفئة')
     description = models.TextField(blank=True, null=True, verbose_name='الوصف')
     
@@ -100,6 +106,21 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.product_number} - {self.name}"
     
+    def save(self, *args, **kwargs):
+        """تحديث الاسم الموحد للبحث مع كل حفظ"""
+        self.name_normalized = normalize_arabic(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields and 'name_normalized' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['name_normalized']
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """حفظ رقم المنتج كما تم تحميله لمعرفة تغييره عند الحفظ (فهرس الإكمال التلقائي)"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_product_number = instance.__dict__.get('product_number')
+        return instance
+    
     def get_primary_location(self):
         """إرجاع الموقع الأساسي للمنتج"""
         return self.location
@@ -198,6 +219,8 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['order_number']),
+            # ترقيم صفحات orders_list بالمؤشر
+            models.Index(fields=['-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -213,6 +236,9 @@ class ProductReturn(models.Model):
     total_products = models.IntegerField(default=0, verbose_name='عدد المنتجات')
     total_quantities = models.IntegerField(default=0, verbose_name='إجمالي الكميات المرتجعة')
     
+    # الطلبية التي أُرجعت منها المنتجات (اختياري) - الكميات تُتحقق مقابل أسطرها
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='returns', verbose_name='الطلبية')
+    
     # معلومات إضافية
     return_reason = models.CharField(max_length=200, blank=True, null=True, verbose_name='سبب الإرجاع')
     returned_by = models.CharField(max_length=200, blank=True, null=True, verbose_name='اسم المرسل')
@@ -238,6 +264,199 @@ class ProductReturn(models.Model):
         return self.total_quantities
 
 
+class OrderLine(models.Model):
+    """سطر طلبية - نسخة مفهرسة من Order.products_data للاستعلام حسب المنتج"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines', verbose_name='الطلبية')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_lines', verbose_name='المنتج')
+    position = models.PositiveIntegerField(default=0, verbose_name='الترتيب')
+    
+    product_number = models.CharField(max_length=100, verbose_name='رقم المنتج')
+    quantity_taken = models.IntegerField(default=0, verbose_name='الكمية المسحوبة')
+    old_quantity = models.IntegerField(null=True, blank=True, verbose_name='الكمية قبل')
+    new_quantity = models.IntegerField(null=True, blank=True, verbose_name='الكمية بعد')
+    
+    # نفس تاريخ الطلبية - مكرر هنا ليخدمه فهرس (product, created_at)
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='تاريخ الإنشاء')
+    
+    class Meta:
+        verbose_name = 'سطر طلبية'
+        verbose_name_plural = 'أسطر الطلبيات'
+        ordering = ['order', 'position']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+            models.Index(fields=['product_number']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_number} × {self.quantity_taken}"
+
+
+class ReturnLine(models.Model):
+    """سطر مرتجع - نسخة مفهرسة من ProductReturn.products_data للاستعلام حسب المنتج"""
+    product_return = models.ForeignKey(ProductReturn, on_delete=models.CASCADE, related_name='lines', verbose_name='المرتجع')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='return_lines', verbose_name='المنتج')
+    position = models.PositiveIntegerField(default=0, verbose_name='الترتيب')
+    
+    product_number = models.CharField(max_length=100, verbose_name='رقم المنتج')
+    product_name = models.CharField(max_length=200, blank=True, null=True, verbose_name='اسم المنتج')
+    quantity_returned = models.IntegerField(default=0, verbose_name='الكمية المرتجعة')
+    quantity_before = models.IntegerField(null=True, blank=True, verbose_name='الكمية قبل')
+    quantity_after = models.IntegerField(null=True, blank=True, verbose_name='الكمية بعد')
+    
+    # نفس تاريخ المرتجع - مكرر هنا ليخدمه فهرس (product, created_at)
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='تاريخ الإنشاء')
+    
+    class Meta:
+        verbose_name = 'سطر مرتجع'
+        verbose_name_plural = 'أسطر المرتجعات'
+        ordering = ['product_return', 'position']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+            models.Index(fields=['product_number']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_number} × {self.quantity_returned}"
+
+
+class ReturnStatistics(models.Model):
+    """
+    عدادات المرتجعات (انظر return_statistics.py): صف لكل يوم (YYYY-MM-DD) - الإجمالي مجموع الأيام
+    تُحدث في نفس معاملة إنشاء المرتجع وتُصلح بـ manage.py rebuild_return_statistics
+    """
+    period = models.CharField(max_length=10, unique=True, verbose_name='الفترة')
+    returns_count = models.BigIntegerField(default=0, verbose_name='عدد المرتجعات')
+    quantities_total = models.BigIntegerField(default=0, verbose_name='إجمالي الكميات المرتجعة')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')
+
+    class Meta:
+        verbose_name = 'إحصائيات المرتجعات'
+        verbose_name_plural = 'إحصائيات المرتجعات'
+
+    def __str__(self):
+        return f"{self.period}: {self.returns_count} / {self.quantities_total}"
+
+
+class DataVersion(models.Model):
+    """
+    عداد إصدار مشترك بين العمليات (انظر data_versions.py)
+    في قاعدة البيانات حتى يراه كل worker فور رفعه مهما كان CACHES
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='اسم العداد')
+    version = models.BigIntegerField(default=0, verbose_name='الإصدار')
+    
+    class Meta:
+        verbose_name = 'إصدار البيانات'
+        verbose_name_plural = 'إصدارات البيانات'
+    
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class ProductNumberChange(models.Model):
+    """
+    سجل تغييرات أرقام المنتجات (إضافة/حذف/تغيير رقم) لفهرس الإكمال التلقائي في كل worker
+    انظر autocomplete.py - رقم فارغ يعني إعادة بناء الفهرس بالكامل
+    """
+    product_number = models.CharField(max_length=100, null=True, blank=True, verbose_name='رقم المنتج')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='وقت التغيير')
+
+    class Meta:
+        verbose_name = 'تغيير رقم منتج'
+        verbose_name_plural = 'تغييرات أرقام المنتجات'
+
+    def __str__(self):
+        return self.product_number or 'إعادة بناء'
+
+
+class DocumentCounter(models.Model):
+    """
+    عداد أرقام المستندات (انظر document_numbers.py): صف لكل بادئة، أو لكل بادئة ويوم في الترقيم اليومي
+    العداد المتصل على PostgreSQL يستخدم التسلسلات بدلاً منه
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='اسم العداد')
+    value = models.BigIntegerField(default=0, verbose_name='آخر رقم')
+    
+    class Meta:
+        verbose_name = 'عداد أرقام المستندات'
+        verbose_name_plural = 'عدادات أرقام المستندات'
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class ConfirmationJob(models.Model):
+    """
+    طلب تأكيد في قائمة الانتظار (الوضع غير المتزامن لـ confirm_products)
+    يُنفذه manage.py process_confirmation_jobs ويتابعه العميل برقم التذكرة
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'في الانتظار'),
+        (STATUS_DONE, 'تم'),
+        (STATUS_FAILED, 'فشل'),
+    ]
+    
+    ticket = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name='رقم التذكرة')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='الحالة')
+    
+    # بيانات الطلب: products = [[رقم المنتج، الكمية], ...]
+    payload = models.JSONField(default=dict, verbose_name='بيانات الطلب')
+    user = models.CharField(max_length=100, blank=True, default='Guest', verbose_name='المستخدم')
+    
+    # النتيجة
+    order_number = models.CharField(max_length=50, blank=True, null=True, verbose_name='رقم الطلبية')
+    result = models.JSONField(null=True, blank=True, verbose_name='النتيجة')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='تاريخ التنفيذ')
+    
+    class Meta:
+        verbose_name = 'طلب تأكيد في الانتظار'
+        verbose_name_plural = 'طلبات التأكيد في الانتظار'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.ticket} - {self.get_status_display()}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    مفاتيح Idempotency-Key لعمليات الكتابة (تأكيد الطلبيات، المرتجعات)
+    إعادة إرسال نفس الطلب بنفس المفتاح تُرجع الاستجابة الأصلية بدلاً من تنفيذه مرة ثانية
+    """
+    endpoint = models.CharField(max_length=100, verbose_name='العملية')
+    # صاحب المفتاح (user:<المعرف> أو session:<مفتاح الجلسة>) - نفس المفتاح من مستخدم آخر طلب مستقل
+    scope = models.CharField(max_length=100, default='', verbose_name='النطاق')
+    key = models.CharField(max_length=255, verbose_name='المفتاح')
+    request_hash = models.CharField(max_length=64, verbose_name='بصمة الطلب')
+    
+    # الاستجابة المحفوظة
+    status_code = models.IntegerField(default=0, verbose_name='رمز الاستجابة')
+    response_body = models.TextField(blank=True, default='', verbose_name='محتوى الاستجابة')
+    content_type = models.CharField(max_length=100, blank=True, default='application/json', verbose_name='نوع المحتوى')
+    
+    user = models.CharField(max_length=100, blank=True, default='Guest', verbose_name='المستخدم')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    expires_at = models.DateTimeField(verbose_name='تاريخ الانتهاء')
+    
+    class Meta:
+        verbose_name = 'مفتاح تكرار آمن'
+        verbose_name_plural = 'مفاتيح التكرار الآمن'
+        unique_together = ['endpoint', 'scope', 'key']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.endpoint} - {self.key}"
+
+
 # ========== نظام المستخدمين والصلاحيات ==========
 
 class UserProfile(models.Model):
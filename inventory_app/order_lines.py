@@ -0,0 +1,198 @@
+"""
+أسطر الطلبيات والمرتجعات (OrderLine / ReturnLine)
+- تُكتب في نفس معاملة إنشاء الطلبية أو المرتجع من نفس بيانات products_data
+- products_data يبقى كما هو (النسخ الاحتياطي والتوافق) والأسطر نسخة مفهرسة منه
+- الطلبيات القديمة: manage.py backfill_order_lines
+- returnable_quantities: الكمية القابلة للإرجاع من طلبية باستعلام واحد على الأسطر المفهرسة
+"""
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Product, Order, OrderLine, ReturnLine
+
+
+BACKFILL_CHUNK_SIZE = 500
+
+
+def _product_ids(products_data_lists):
+    """{رقم المنتج: المعرف} لكل الأرقام في عدة قوائم products_data - استعلام واحد"""
+    numbers = {
+        item.get('product_number')
+        for products_data in products_data_lists
+        for item in (products_data or [])
+        if isinstance(item, dict) and item.get('product_number')
+    }
+    if not numbers:
+        return {}
+    return dict(Product.objects.filter(product_number__in=numbers).values_list('product_number', 'id'))
+
+
+def _order_lines(order, product_ids):
+    return [
+        OrderLine(
+            order_id=order.id,
+            product_id=product_ids.get(item.get('product_number')),
+            position=position,
+            product_number=item.get('product_number', ''),
+            quantity_taken=item.get('quantity_taken') or 0,
+            old_quantity=item.get('old_quantity'),
+            new_quantity=item.get('new_quantity'),
+            created_at=order.created_at,
+        )
+        for position, item in enumerate(order.products_data or [])
+        if isinstance(item, dict)
+    ]
+
+
+def _return_lines(product_return, product_ids):
+    return [
+        ReturnLine(
+            product_return_id=product_return.id,
+            product_id=product_ids.get(item.get('product_number')),
+            position=position,
+            product_number=item.get('product_number', ''),
+            product_name=item.get('product_name'),
+            quantity_returned=item.get('quantity_returned') or 0,
+            quantity_before=item.get('quantity_before'),
+            quantity_after=item.get('quantity_after'),
+            created_at=product_return.created_at,
+        )
+        for position, item in enumerate(product_return.products_data or [])
+        if isinstance(item, dict)
+    ]
+
+
+def create_order_lines(order, product_ids=None):
+    """كتابة أسطر طلبية جديدة (داخل معاملة إنشائها)"""
+    if product_ids is None:
+        product_ids = _product_ids([order.products_data])
+    return OrderLine.objects.bulk_create(_order_lines(order, product_ids))
+
+
+def create_lines_for_orders(orders):
+    """كتابة أسطر عدة طلبيات جديدة - استعلام منتجات واحد + إدخال واحد"""
+    product_ids = _product_ids([order.products_data for order in orders])
+    return OrderLine.objects.bulk_create([
+        line for order in orders for line in _order_lines(order, product_ids)
+    ])
+
+
+def create_return_lines(product_return, product_ids=None):
+    """كتابة أسطر مرتجع جديد (داخل معاملة إنشائه)"""
+    if product_ids is None:
+        product_ids = _product_ids([product_return.products_data])
+    return ReturnLine.objects.bulk_create(_return_lines(product_return, product_ids))
+
+
+def returnable_quantities(order, product_numbers):
+    """
+    {رقم المنتج: الكمية التي ما زالت قابلة للإرجاع} لمنتجات الطلبية
+    = المسحوب في الطلبية - المُرجع سابقاً بمرتجعات مرتبطة بها
+    استعلام واحد على أسطر هذه الطلبية فقط (فهرس order) مع استعلام فرعي على أسطر مرتجعاتها
+    المنتج غير الموجود في الطلبية لا يظهر في النتيجة
+    """
+    returned = (
+        ReturnLine.objects
+        .filter(product_return__order_id=order.id, product_number=OuterRef('product_number'))
+        .order_by()
+        .values('product_number')
+        .annotate(total=Sum('quantity_returned'))
+        .values('total')
+    )
+    rows = (
+        OrderLine.objects
+        .filter(order_id=order.id, product_number__in=list(product_numbers))
+        .order_by()
+        .values('product_number')
+        .annotate(picked=Sum('quantity_taken'), returned=Coalesce(Subquery(returned), Value(0)))
+    )
+    return {row['product_number']: row['picked'] - row['returned'] for row in rows}
+
+
+def check_returnable(order, lines):
+    """
+    التحقق من أسطر مرتجع [(رقم المنتج، الكمية)] مقابل طلبية - يعيد قائمة الأخطاء (فارغة إذا كان صالحاً)
+    الطلبيات القديمة بدون أسطر تُبنى أسطرها أولاً من products_data
+    """
+    totals = OrderedDict()
+    for number, quantity in lines:
+        totals[number] = totals.get(number, 0) + quantity
+
+    if not OrderLine.objects.filter(order_id=order.id).exists():
+        create_order_lines(order)
+
+    returnable = returnable_quantities(order, totals)
+    errors = []
+    for number, quantity in totals.items():
+        if number not in returnable:
+            errors.append(f'المنتج {number} ليس ضمن الطلبية {order.order_number}')
+        elif quantity > returnable[number]:
+            errors.append(f'الكمية المرتجعة للمنتج {number} ({quantity}) أكبر من المتبقي في الطلبية ({max(returnable[number], 0)})')
+    return errors
+
+
+def _chunks(items, size=BACKFILL_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def rebuild_order_lines(orders):
+    """إعادة بناء أسطر مجموعة طلبيات - لكل دفعة: حذف واحد + استعلام منتجات واحد + إدخال واحد"""
+    count = 0
+    for chunk in _chunks(orders):
+        OrderLine.objects.filter(order_id__in=[order.id for order in chunk]).delete()
+        count += len(create_lines_for_orders(chunk))
+    return count
+
+
+def rebuild_return_lines(product_returns):
+    """إعادة بناء أسطر مجموعة مرتجعات - لكل دفعة: حذف واحد + استعلام منتجات واحد + إدخال واحد"""
+    count = 0
+    for chunk in _chunks(product_returns):
+        product_ids = _product_ids([r.products_data for r in chunk])
+        ReturnLine.objects.filter(product_return_id__in=[r.id for r in chunk]).delete()
+        lines = [line for r in chunk for line in _return_lines(r, product_ids)]
+        ReturnLine.objects.bulk_create(lines)
+        count += len(lines)
+    return count
+
+
+def backfill_lines(model, chunk_size=BACKFILL_CHUNK_SIZE, only_missing=True):
+    """
+    بناء الأسطر من products_data على دفعات (ترتيب بالمعرف)
+    model: Order أو ProductReturn - يعيد (عدد السجلات، عدد الأسطر)
+    """
+    if model is Order:
+        rebuild, line_model, parent_field = rebuild_order_lines, OrderLine, 'order_id'
+    else:
+        rebuild, line_model, parent_field = rebuild_return_lines, ReturnLine, 'product_return_id'
+
+    parents_count = 0
+    lines_count = 0
+    last_pk = 0
+    while True:
+        chunk = list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('id', 'products_data', 'created_at')[:chunk_size]
+        )
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        if only_missing:
+            done = set(
+                line_model.objects.filter(**{f'{parent_field}__in': [p.id for p in chunk]})
+                .values_list(parent_field, flat=True).distinct()
+            )
+            chunk = [p for p in chunk if p.id not in done]
+
+        # معاملة لكل دفعة (حذف الأسطر القديمة + إدخال الجديدة معاً)
+        with transaction.atomic():
+            lines_count += rebuild(chunk)
+        parents_count += len(chunk)
+
+    return parents_count, lines_count
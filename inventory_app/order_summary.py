@@ -0,0 +1,106 @@
+"""
+ملخص الطلبيات لصفحة orders_list (طلبيات اليوم، الكميات المسحوبة اليوم/هذا الأسبوع، أكثر المستلمين)
+- مخزن في Django cache لكل أيام الأسبوع الحالي مع آخر معرف طلبية تم احتسابه (last_id)
+- التحديث تدريجي: عند كل قراءة تُضاف فقط الطلبيات الجديدة (id > last_id) باستعلام صغير على المفتاح الأساسي،
+  فيشمل كل طرق الإنشاء (create و bulk_create و قائمة الانتظار) بدون إشارات
+- الحذف يرفع إصدار ORDERS (signals.py) فيُعاد بناء الملخص باستعلام تجميعي واحد
+- يُعاد البناء أيضاً بعد SUMMARY_REBUILD_SECONDS لتصحيح أي طلبية التزمت معاملتها بعد طلبية ذات معرف أكبر
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .data_versions import get_version, ORDERS
+from .models import Order
+
+
+CACHE_KEY = 'inventory_app:orders_summary'
+SUMMARY_DAYS = 7
+SUMMARY_REBUILD_SECONDS = 600
+TOP_RECIPIENTS = 5
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _empty_day():
+    return {'orders': 0, 'units': 0, 'recipients': {}}
+
+
+def _add(days, day, recipient_name, orders, units):
+    entry = days.setdefault(day.isoformat(), _empty_day())
+    entry['orders'] += orders
+    entry['units'] += units
+    name = recipient_name or ''
+    entry['recipients'][name] = entry['recipients'].get(name, 0) + units
+
+
+def _build(start, version):
+    """بناء ملخص الأسبوع باستعلام تجميعي واحد (يوم × مستلم)"""
+    days = {}
+    last_id = Order.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    rows = (
+        Order.objects.filter(created_at__gte=_day_start(start), id__lte=last_id)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'recipient_name')
+        .annotate(orders=Count('id'), units=Sum('total_quantities'))
+        .order_by()
+    )
+    for row in rows:
+        _add(days, row['day'], row['recipient_name'], row['orders'], row['units'] or 0)
+    return {'version': version, 'built_at': time.time(), 'last_id': last_id, 'days': days}
+
+
+def _refresh(state, start):
+    """إضافة الطلبيات التي أُنشئت بعد آخر قراءة فقط"""
+    new_orders = (
+        Order.objects.filter(id__gt=state['last_id'], created_at__gte=_day_start(start))
+        .order_by('id')
+        .values_list('id', 'created_at', 'recipient_name', 'total_quantities')
+    )
+    changed = False
+    for order_id, created_at, recipient_name, units in new_orders:
+        _add(state['days'], timezone.localdate(created_at), recipient_name, 1, units)
+        state['last_id'] = order_id
+        changed = True
+
+    # إزالة الأيام التي خرجت من نافذة الأسبوع
+    for day in [day for day in state['days'] if day < start.isoformat()]:
+        del state['days'][day]
+        changed = True
+    return changed
+
+
+def get_orders_summary():
+    """ملخص اليوم والأسبوع الحالي"""
+    today = timezone.localdate()
+    start = today - timedelta(days=SUMMARY_DAYS - 1)
+    version = get_version(ORDERS)
+
+    state = cache.get(CACHE_KEY)
+    if (state is None or state['version'] != version
+            or time.time() - state['built_at'] > SUMMARY_REBUILD_SECONDS):
+        state = _build(start, version)
+        cache.set(CACHE_KEY, state, timeout=None)
+    elif _refresh(state, start):
+        cache.set(CACHE_KEY, state, timeout=None)
+
+    today_entry = state['days'].get(today.isoformat(), _empty_day())
+    week_recipients = {}
+    for entry in state['days'].values():
+        for name, units in entry['recipients'].items():
+            if name:
+                week_recipients[name] = week_recipients.get(name, 0) + units
+
+    return {
+        'orders_today': today_entry['orders'],
+        'units_today': today_entry['units'],
+        'orders_week': sum(entry['orders'] for entry in state['days'].values()),
+        'units_week': sum(entry['units'] for entry in state['days'].values()),
+        'top_recipients': sorted(week_recipients.items(), key=lambda item: (-item[1], item[0]))[:TOP_RECIPIENTS],
+    }
@@ -0,0 +1,133 @@
+"""
+ترقيم الصفحات بالمؤشر (Keyset / Cursor Pagination)
+- بدلاً من OFFSET: كل صفحة تبدأ بعد آخر قيمة في الصفحة السابقة
+- تكلفة الصفحة العميقة مثل الصفحة الأولى (تستخدم فهرس الترتيب مباشرة)
+- يجب أن يكون آخر حقل في الترتيب فريداً (مثل product_number أو id)
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """مؤشر صفحة غير صالح"""
+
+
+def encode_cursor(values):
+    """ترميز قيم الترتيب لآخر عنصر إلى نص آمن للرابط"""
+    raw = json.dumps(values, default=lambda v: v.isoformat() if hasattr(v, 'isoformat') else str(v))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """فك ترميز المؤشر والتحقق من عدد القيم"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        raise InvalidCursor('مؤشر الصفحة غير صالح')
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('مؤشر الصفحة غير صالح')
+    return values
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """قراءة حجم الصفحة من الطلب مع حصره بين 1 والحد الأقصى"""
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(page_size, maximum))
+
+
+class KeysetPage:
+    """صفحة واحدة من النتائج مع مؤشرات التالي والسابق"""
+
+    def __init__(self, items, page_size, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _parse_ordering(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _item_values(item, fields):
+    if isinstance(item, dict):
+        return [item[name] for name, _ in fields]
+    return [getattr(item, name) for name, _ in fields]
+
+
+def _seek_condition(fields, values):
+    """
+    شرط "بعد هذه القيم" بالترتيب المعجمي:
+    (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+    مع مراعاة اتجاه كل حقل
+    """
+    condition = Q()
+    for index, (name, descending) in enumerate(fields):
+        clause = Q(**{f'{name}__{"lt" if descending else "gt"}': values[index]})
+        for previous_index in range(index):
+            clause &= Q(**{fields[previous_index][0]: values[previous_index]})
+        condition |= clause
+    return condition
+
+
+def keyset_paginate(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE, ordering=None):
+    """
+    إرجاع KeysetPage من queryset مرتب
+    after: مؤشر الصفحة التالية - before: مؤشر الصفحة السابقة
+    ordering: الافتراضي هو ترتيب queryset الحالي
+    """
+    ordering = list(ordering or queryset.query.order_by)
+    if not ordering:
+        raise ValueError('keyset_paginate يحتاج queryset مرتباً')
+
+    fields = _parse_ordering(ordering)
+
+    if before:
+        # نقرأ بالاتجاه المعاكس ثم نعكس النتائج
+        reversed_fields = [(name, not descending) for name, descending in fields]
+        values = decode_cursor(before, len(fields))
+        rows = list(
+            queryset.filter(_seek_condition(reversed_fields, values))
+            .order_by(*[('' if descending else '-') + name for name, descending in fields])[:page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        items = rows[:page_size]
+        items.reverse()
+        has_next = True
+    else:
+        if after:
+            values = decode_cursor(after, len(fields))
+            queryset = queryset.filter(_seek_condition(fields, values))
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_next = len(rows) > page_size
+        items = rows[:page_size]
+        has_previous = bool(after)
+
+    next_cursor = encode_cursor(_item_values(items[-1], fields)) if items and has_next else None
+    previous_cursor = encode_cursor(_item_values(items[0], fields)) if items and has_previous else None
+
+    return KeysetPage(items, page_size, next_cursor=next_cursor, previous_cursor=previous_cursor)
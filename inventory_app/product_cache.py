@@ -0,0 +1,200 @@
+"""
+فهرس المنتجات في الذاكرة لتسريع /api/search/
+- يربط رقم المنتج بسجل مختصر (الاسم، الفئة، الكمية، بيانات الموقع)
+- التعديلات (إشارات Product / Location في signals.py والتحديثات الجماعية في deductions.py) تُفرغ السجلات المعنية فقط
+  فيُعاد تحميلها من قاعدة البيانات عند الطلب - التفريغ آمن حتى لو أُلغي savepoint بعده
+- التعديلات تُجمع لكل معاملة (data_versions.mark_changed): تفريغ واحد ورفع واحد لعدادي
+  PRODUCTS / LOCATIONS عند الالتزام مهما كان عدد الصفوف
+- باقي العمليات (workers) تقارن العدادين (جدول DataVersion) مرة كل VERSION_CHECK_SECONDS على الأكثر
+  وليس في كل بحث، فقد تعرض بيانات عملية أخرى متأخرة حتى ثانيتين
+"""
+import threading
+import time
+from collections import namedtuple, defaultdict
+
+from .data_versions import get_versions, mark_changed, PRODUCTS, LOCATIONS
+from .models import Product
+
+
+# أقصى مدة (بالثواني) بين مقارنتين لعدادات الإصدار المشتركة
+VERSION_CHECK_SECONDS = 2
+TRACKED_VERSIONS = (PRODUCTS, LOCATIONS)
+
+
+ProductRecord = namedtuple('ProductRecord', [
+    'id', 'product_number', 'name', 'category', 'quantity',
+    'location_id', 'row', 'column', 'notes',
+])
+
+
+class ProductLookupCache:
+    """فهرس رقم المنتج -> ProductRecord مع عدادات hit/miss"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._numbers_by_id = {}
+        self._numbers_by_location = defaultdict(set)
+        # {اسم العداد: الإصدار} الذي تطابقه السجلات المخزنة - None: غير معروف
+        self._versions = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- القراءة ----------
+
+    def get_many(self, product_numbers):
+        """إرجاع {رقم المنتج: ProductRecord} للأرقام الموجودة - قاعدة البيانات فقط للأرقام غير المخزنة"""
+        self._sync_versions()
+
+        found = {}
+        missing = []
+        with self._lock:
+            for number in set(product_numbers):
+                record = self._records.get(number)
+                if record is None:
+                    missing.append(number)
+                else:
+                    found[number] = record
+            self.hits += len(found)
+            self.misses += len(missing)
+            versions = self._versions
+
+        if missing:
+            loaded = self._load(missing)
+            found.update(loaded)
+            with self._lock:
+                # لا نخزن ما تم تحميله إذا تغير الإصدار أثناء الاستعلام
+                if versions is not None and versions is self._versions:
+                    for record in loaded.values():
+                        self._store(record)
+
+        return found
+
+    def _load(self, product_numbers):
+        products = Product.objects.filter(
+            product_number__in=product_numbers
+        ).select_related('location')
+        return {p.product_number: self.record_for(p) for p in products}
+
+    @staticmethod
+    def record_for(product):
+        """بناء سجل مختصر من كائن منتج (يُفترض أن الموقع محمّل مسبقاً)"""
+        location = product.location if product.location_id else None
+        return ProductRecord(
+            id=product.id,
+            product_number=product.product_number,
+            name=product.name,
+            category=product.category,
+            quantity=product.quantity,
+            location_id=product.location_id,
+            row=location.row if location else None,
+            column=location.column if location else None,
+            notes=location.notes if location else None,
+        )
+
+    # ---------- التخزين (داخل القفل) ----------
+
+    def _store(self, record):
+        self._discard_id(record.id)
+        self._records[record.product_number] = record
+        self._numbers_by_id[record.id] = record.product_number
+        if record.location_id:
+            self._numbers_by_location[record.location_id].add(record.product_number)
+
+    def _discard_id(self, product_id):
+        number = self._numbers_by_id.pop(product_id, None)
+        if number is None:
+            return
+        record = self._records.pop(number, None)
+        if record and record.location_id:
+            numbers = self._numbers_by_location.get(record.location_id)
+            if numbers:
+                numbers.discard(number)
+                if not numbers:
+                    del self._numbers_by_location[record.location_id]
+
+    def _discard_location(self, location_id):
+        for number in list(self._numbers_by_location.get(location_id, ())):
+            record = self._records.get(number)
+            if record:
+                self._discard_id(record.id)
+
+    # ---------- التعديلات (تُطبق عند الالتزام) ----------
+
+    def discard_product(self, product_id):
+        """تفريغ منتج بعد حفظه أو حذفه"""
+        mark_changed(PRODUCTS, owner=self, item=('product', product_id))
+
+    def discard_products(self, product_ids):
+        """تفريغ عدة منتجات (للتحديثات الجماعية مثل bulk_update و UPDATE المباشر)"""
+        product_ids = list(product_ids)
+        if product_ids:
+            mark_changed(PRODUCTS, owner=self, item=('products', product_ids))
+
+    def discard_location(self, location_id):
+        """تفريغ منتجات موقع بعد تعديله أو حذفه (Django يفرغ location بـ UPDATE بدون إشارات)"""
+        mark_changed(LOCATIONS, owner=self, item=('location', location_id))
+
+    def invalidate(self):
+        """تفريغ الفهرس بالكامل - للتحديثات الجماعية مثل QuerySet.update()"""
+        mark_changed(PRODUCTS, owner=self, item=('all', None))
+
+    def apply_committed(self, versions, items):
+        """تطبيق تعديلات معاملة ملتزمة بعد رفع العدادات (من data_versions)"""
+        with self._lock:
+            bumped = {name: version for name, version in versions.items() if name in TRACKED_VERSIONS}
+            if self._versions is None or any(
+                version != self._versions.get(name, 0) + 1 for name, version in bumped.items()
+            ):
+                # فاتنا تعديل من عملية أخرى - نبدأ من جديد ونقرأ العدادات عند البحث التالي
+                self._clear()
+                self._versions = None
+                return
+            for kind, value in items:
+                if kind == 'all':
+                    self._clear()
+                elif kind == 'product':
+                    self._discard_id(value)
+                elif kind == 'products':
+                    for product_id in value:
+                        self._discard_id(product_id)
+                elif kind == 'location':
+                    self._discard_location(value)
+            self._versions = {**self._versions, **bumped}
+
+    # ---------- الإصدار المشترك ----------
+
+    def _sync_versions(self):
+        """مقارنة العدادات المشتركة مرة كل VERSION_CHECK_SECONDS على الأكثر"""
+        now = time.monotonic()
+        if self._versions is not None and now - self._checked_at < VERSION_CHECK_SECONDS:
+            return
+        shared = dict(zip(TRACKED_VERSIONS, get_versions(*TRACKED_VERSIONS)))
+        with self._lock:
+            if shared != self._versions:
+                self._clear()
+                self._versions = shared
+            self._checked_at = now
+
+    def _clear(self):
+        self._records.clear()
+        self._numbers_by_id.clear()
+        self._numbers_by_location.clear()
+
+    # ---------- الإحصائيات ----------
+
+    def stats(self):
+        """إحصائيات الفهرس لمعرفة الحجم المناسب"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._records),
+                'versions': self._versions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+product_cache = ProductLookupCache()
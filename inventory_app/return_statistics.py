@@ -0,0 +1,129 @@
+"""
+إحصائيات المرتجعات لصفحة returns_list (العدد الكلي، مرتجعات اليوم، إجمالي الكميات)
+- جدول ReturnStatistics: صف لكل يوم فقط - لا صف للإجمالي، فمعاملات إنشاء المرتجعات
+  لا تنتظر على صف واحد مشترك (معاملتان تتعارضان فقط عند أول مرتجع في نفس اليوم)
+- record_return: إنشاء أو زيادة صف اليوم بعبارة INSERT ... ON CONFLICT DO UPDATE واحدة
+  داخل معاملة إنشاء المرتجع (الزيادة في قاعدة البيانات - لا تضيع بين معاملتين متزامنتين)
+- get_return_statistics: مجموع صفوف الأيام باستعلام تجميعي واحد على الجدول الصغير
+  بدلاً من count() و aggregate(Sum) على كامل جدول المرتجعات
+- rebuild_return_statistics: إعادة البناء من السجل على دفعات بالمعرف
+  (بعد الاستعادة من نسخة احتياطية أو الحذف الجماعي أو لإصلاح أي انحراف)
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ProductReturn, ReturnStatistics
+
+
+REBUILD_CHUNK_SIZE = 5000
+# المرتجعات الأحدث من هذه المدة تُجمع في المرحلة المقفلة من إعادة البناء
+# (الأقدم ملتزمة حتماً - لا تبقى معاملة إنشاء مرتجع مفتوحة ساعة)
+RECENT_RETURNS_SECONDS = 60 * 60
+
+# إنشاء صف اليوم أو زيادته بعبارة واحدة (PostgreSQL و SQLite >= 3.24)
+# لا فحص "هل الصف موجود" قبل الكتابة، فلا تضيع زيادة عند أول مرتجع في اليوم من معاملتين متزامنتين
+RECORD_SQL = f"""
+    INSERT INTO {ReturnStatistics._meta.db_table} (period, returns_count, quantities_total, updated_at)
+    VALUES (%s, 1, %s, %s)
+    ON CONFLICT (period) DO UPDATE SET
+        returns_count = {ReturnStatistics._meta.db_table}.returns_count + excluded.returns_count,
+        quantities_total = {ReturnStatistics._meta.db_table}.quantities_total + excluded.quantities_total,
+        updated_at = excluded.updated_at
+"""
+
+
+def _period(day):
+    return day.isoformat()
+
+
+def record_return(product_return):
+    """إضافة مرتجع جديد إلى عداد يومه - يجب استدعاؤها داخل معاملة إنشائه"""
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(RECORD_SQL, [
+            _period(timezone.localdate(product_return.created_at)), product_return.total_quantities, now,
+        ])
+
+
+def get_return_statistics():
+    """العدد الكلي ومرتجعات اليوم وإجمالي الكميات - استعلام واحد"""
+    totals = ReturnStatistics.objects.aggregate(
+        total_returns=Sum('returns_count'),
+        total_quantities=Sum('quantities_total'),
+        today_returns=Sum('returns_count', filter=Q(period=_period(timezone.localdate()))),
+    )
+    return {
+        'total_returns': totals['total_returns'] or 0,
+        'today_returns': totals['today_returns'] or 0,
+        'total_quantities_returned': totals['total_quantities'] or 0,
+    }
+
+
+def _aggregate(queryset, totals):
+    """تجميع مرتجعات حسب اليوم (بالمنطقة الزمنية الحالية) وإضافتها إلى totals"""
+    rows = (
+        queryset.annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(returns_count=Count('id'), quantities_total=Sum('total_quantities'))
+        .order_by()
+    )
+    for row in rows:
+        period = _period(row['day'])
+        count, quantities = totals.get(period, (0, 0))
+        totals[period] = (count + row['returns_count'], quantities + (row['quantities_total'] or 0))
+
+
+def _replace(totals):
+    """استبدال صفوف العدادات بالقيم المحسوبة (تحديث المتغير فقط)"""
+    ReturnStatistics.objects.exclude(period__in=list(totals)).delete()
+    existing = {row.period: row for row in ReturnStatistics.objects.filter(period__in=list(totals))}
+    now = timezone.now()
+    to_update = []
+    to_create = []
+    for period, (returns_count, quantities_total) in totals.items():
+        row = existing.get(period)
+        if row is None:
+            to_create.append(ReturnStatistics(
+                period=period, returns_count=returns_count, quantities_total=quantities_total,
+            ))
+        elif (row.returns_count, row.quantities_total) != (returns_count, quantities_total):
+            row.returns_count = returns_count
+            row.quantities_total = quantities_total
+            row.updated_at = now
+            to_update.append(row)
+    ReturnStatistics.objects.bulk_update(to_update, ['returns_count', 'quantities_total', 'updated_at'])
+    ReturnStatistics.objects.bulk_create(to_create)
+
+
+def rebuild_return_statistics(chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    إعادة بناء العدادات من جدول المرتجعات - يعيد عدد المرتجعات المحتسبة
+    1. بدون قفل: استعلام تجميعي لكل نطاق معرفات بحجم chunk_size للمرتجعات الأقدم من RECENT_RETURNS_SECONDS
+    2. معاملة قصيرة: قفل جدول العدادات (PostgreSQL: EXCLUSIVE ينتظر معاملات المرتجعات التي زادت عداداً
+       ويوقف الجديدة عند record_return)، ثم تجميع المرتجعات الأحدث (فهرس created_at) واستبدال الصفوف
+       فكل مرتجع إما ظاهر في التجميع أو ينتظر القفل ويُضاف فوق القيم الجديدة
+    إنشاء المرتجعات ينتظر فقط أثناء المرحلة الثانية وليس طوال المسح
+    """
+    cutoff = timezone.now() - timedelta(seconds=RECENT_RETURNS_SECONDS)
+    totals = {}
+    last_id = ProductReturn.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    start = 0
+    while start < last_id:
+        _aggregate(
+            ProductReturn.objects.filter(id__gt=start, id__lte=start + chunk_size, created_at__lt=cutoff),
+            totals,
+        )
+        start += chunk_size
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {ReturnStatistics._meta.db_table} IN EXCLUSIVE MODE')
+        _aggregate(ProductReturn.objects.filter(created_at__gte=cutoff), totals)
+        _replace(totals)
+
+    return sum(returns_count for returns_count, _ in totals.values())
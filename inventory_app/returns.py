@@ -0,0 +1,135 @@
+"""
+إنشاء المرتجعات (مسار مشترك بين process_return واستيراد ملفات المرتجعات)
+- ربط اختياري بطلبية مع التحقق من الكميات القابلة للإرجاع
+- إضافة الكميات بعبارة UPDATE واحدة (apply_restock) ثم ProductReturn وأسطره وعدادات الإحصائيات
+- استيراد CSV / XLSX: قراءة متدفقة (csv.reader / openpyxl read_only)
+  ثم التحقق من كل أرقام المنتجات باستعلام واحد وإرجاع كل الأسطر الخاطئة معاً
+"""
+import csv
+import io
+
+from .deductions import apply_restock, DeductionError
+from .document_numbers import next_number, RETURN
+from .models import Order, Product, ProductReturn
+from .order_lines import check_returnable, create_return_lines
+from .return_statistics import record_return
+
+
+RETURN_IMPORT_MAX_ROWS = 10000
+# أسماء أعمدة العنوان الشائعة (يُتجاهل السطر الأول إذا كان عمود رقم المنتج أحدها)
+RETURN_IMPORT_HEADER_NAMES = {'code', 'barcode', 'number', 'product_number', 'الرمز', 'الباركود', 'رقم المنتج'}
+
+
+class ReturnError(Exception):
+    """فشل التحقق من المرتجع - لم يُكتب شيء"""
+
+    def __init__(self, errors):
+        super().__init__(errors[0])
+        self.errors = errors
+
+
+def create_product_return(lines, username, order_number=None, return_reason=None, returned_by=None, notes=None):
+    """
+    إنشاء مرتجع من أسطر [(رقم المنتج، الكمية)] - يجب استدعاؤها داخل transaction.atomic
+    يرفع ReturnError بكل الأخطاء إذا لم تُقبل الأسطر
+    """
+    # ربط المرتجع بطلبية (اختياري): لا يُرجع أكثر مما سُحب فيها
+    order = None
+    if order_number:
+        # قفل الطلبية يمنع مرتجعين متزامنين من تجاوز المتبقي معاً
+        order = Order.objects.select_for_update().only(
+            'id', 'order_number', 'created_at'
+        ).filter(order_number=order_number).first()
+        if order is None:
+            raise ReturnError([f'الطلبية {order_number} غير موجودة'])
+        errors = check_returnable(order, lines)
+        if errors:
+            raise ReturnError(errors)
+
+    # إضافة كل الكميات بعبارة واحدة وسجلات العمليات بإدخال واحد
+    try:
+        return_products_data, product_ids = apply_restock(lines, username)
+    except DeductionError as e:
+        raise ReturnError(e.errors)
+
+    product_return = ProductReturn.objects.create(
+        return_number=next_number(RETURN),
+        order=order,
+        products_data=return_products_data,
+        total_products=len(return_products_data),
+        total_quantities=sum(item['quantity_returned'] for item in return_products_data),
+        return_reason=return_reason or None,
+        returned_by=returned_by or None,
+        notes=notes or None,
+        user=username,
+    )
+    create_return_lines(product_return, product_ids)
+    record_return(product_return)
+    return product_return
+
+
+# ========== استيراد ملفات المرتجعات ==========
+
+def _csv_rows(uploaded_file):
+    text = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', errors='replace', newline='')
+    for row in csv.reader(text):
+        yield row
+
+
+def _xlsx_rows(uploaded_file):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(uploaded_file.file, read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+
+def read_return_file(uploaded_file):
+    """
+    قراءة ملف المرتجع سطراً بسطر: العمود الأول رقم المنتج والثاني الكمية (فارغ = 1)
+    يعيد (الأسطر الصالحة [(رقم السطر، رقم المنتج، الكمية)]، الأخطاء [{row, product_number, error}])
+    """
+    name = (uploaded_file.name or '').lower()
+    rows = _xlsx_rows(uploaded_file) if name.endswith('.xlsx') else _csv_rows(uploaded_file)
+
+    lines = []
+    errors = []
+    for row_number, row in enumerate(rows, start=1):
+        cells = ['' if value is None else str(value).strip() for value in (row or [])]
+        if not any(cells):
+            continue
+        number = cells[0]
+        raw_quantity = cells[1] if len(cells) > 1 else ''
+        if row_number == 1 and number.lower() in RETURN_IMPORT_HEADER_NAMES:
+            continue
+        if len(lines) + len(errors) >= RETURN_IMPORT_MAX_ROWS:
+            raise ReturnError([f'عدد الأسطر يتجاوز الحد الأقصى ({RETURN_IMPORT_MAX_ROWS})'])
+
+        if not number:
+            errors.append({'row': row_number, 'product_number': '', 'error': 'رقم المنتج فارغ'})
+            continue
+        try:
+            # Excel يعيد الأرقام الصحيحة كـ 5.0 أحياناً
+            quantity = int(float(raw_quantity)) if raw_quantity else 1
+        except ValueError:
+            errors.append({'row': row_number, 'product_number': number, 'error': f'الكمية غير صحيحة: {raw_quantity}'})
+            continue
+        if quantity <= 0:
+            errors.append({'row': row_number, 'product_number': number, 'error': 'الكمية يجب أن تكون أكبر من صفر'})
+            continue
+        lines.append((row_number, number, quantity))
+
+    return lines, errors
+
+
+def validate_product_numbers(lines):
+    """أخطاء الأسطر التي لا يوجد منتجها - استعلام واحد لكل الأرقام"""
+    numbers = {number for _, number, _ in lines}
+    existing = set(Product.objects.filter(product_number__in=numbers).values_list('product_number', flat=True))
+    return [
+        {'row': row_number, 'product_number': number, 'error': 'المنتج غير موجود'}
+        for row_number, number, _ in lines if number not in existing
+    ]
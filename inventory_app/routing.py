@@ -0,0 +1,153 @@
+"""
+ترتيب مسار الالتقاط على شبكة المستودع
+- المسافة: خطوات أفقية + رأسية بين الخلايا (Manhattan) على إحداثيات (row, column)
+- المنتجات في نفس الخلية = محطة واحدة
+- البداية: أقرب محطة إلى R1C1 (مدخل المستودع)
+- مسارات مبدئية: ثعباني بالصفوف، ثعباني بالأعمدة، أقرب جار - ثم تحسين 2-opt للأفضل منها
+- تحسين 2-opt محدود بنافذة ووقت (ROUTE_TIME_BUDGET_SECONDS) ليبقى أقل من 50ms لـ 500 محطة
+"""
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+ENTRANCE = (1, 1)
+ROUTE_TIME_BUDGET_SECONDS = 0.03
+TWO_OPT_WINDOW = 50
+
+
+def _distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def path_length(cells):
+    """طول المسار بالخطوات بين محطات متتالية"""
+    return sum(_distance(cells[i], cells[i + 1]) for i in range(len(cells) - 1))
+
+
+def _serpentine(cells, by_column=False):
+    """مسار ثعباني: صفاً صفاً مع عكس الاتجاه في كل صف (أو عموداً عموداً)"""
+    major, minor = (1, 0) if by_column else (0, 1)
+    lanes = sorted({cell[major] for cell in cells})
+    rank = {lane: index for index, lane in enumerate(lanes)}
+    return sorted(cells, key=lambda cell: (
+        cell[major],
+        cell[minor] if rank[cell[major]] % 2 == 0 else -cell[minor],
+    ))
+
+
+def _nearest_neighbour(cells, start):
+    """أقرب جار باستخدام قوائم أعمدة مرتبة لكل صف (بدون مقارنة كل المحطات في كل خطوة)"""
+    columns_by_row = {}
+    for row, column in cells:
+        columns_by_row.setdefault(row, []).append(column)
+    for columns in columns_by_row.values():
+        columns.sort()
+    rows = sorted(columns_by_row)
+
+    def take(cell):
+        columns = columns_by_row[cell[0]]
+        columns.pop(bisect_left(columns, cell[1]))
+        if not columns:
+            del columns_by_row[cell[0]]
+            rows.pop(bisect_left(rows, cell[0]))
+
+    path = [start]
+    take(start)
+    current = start
+
+    while rows:
+        best = None
+        best_distance = None
+        index = bisect_left(rows, current[0])
+        low, high = index - 1, index
+        # نفحص الصفوف من الأقرب للأبعد ونتوقف عندما يصبح فرق الصف وحده أكبر من أفضل مسافة
+        while low >= 0 or high < len(rows):
+            if high >= len(rows) or (low >= 0 and current[0] - rows[low] <= rows[high] - current[0]):
+                row = rows[low]
+                low -= 1
+            else:
+                row = rows[high]
+                high += 1
+            row_distance = abs(row - current[0])
+            if best_distance is not None and row_distance >= best_distance:
+                break
+            columns = columns_by_row[row]
+            position = bisect_left(columns, current[1])
+            for candidate in (position - 1, position):
+                if 0 <= candidate < len(columns):
+                    distance = row_distance + abs(columns[candidate] - current[1])
+                    if best_distance is None or distance < best_distance:
+                        best = (row, columns[candidate])
+                        best_distance = distance
+
+        take(best)
+        path.append(best)
+        current = best
+
+    return path
+
+
+def _two_opt(path, deadline, window=TWO_OPT_WINDOW):
+    """تحسين 2-opt لمسار مفتوح (المحطة الأولى ثابتة) ضمن نافذة ووقت محددين"""
+    n = len(path)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            if time.perf_counter() > deadline:
+                return path
+            for j in range(i + 1, min(n, i + window)):
+                a, b, c = path[i - 1], path[i], path[j]
+                before = _distance(a, b)
+                after = _distance(a, c)
+                if j + 1 < n:
+                    d = path[j + 1]
+                    before += _distance(c, d)
+                    after += _distance(b, d)
+                if after < before:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    improved = True
+    return path
+
+
+def optimize_pick_route(stops):
+    """
+    ترتيب محطات الالتقاط في مسار قصير
+    stops: قائمة (رقم المنتج، row، column) بترتيب الإدخال
+    يعيد dict: sequence (محطة لكل خلية مع أرقام منتجاتها)، total_distance، input_distance
+    """
+    products_by_cell = OrderedDict()
+    for product_number, row, column in stops:
+        products_by_cell.setdefault((row, column), []).append(product_number)
+
+    cells = list(products_by_cell)
+    input_distance = path_length(cells)
+
+    if len(cells) > 2:
+        deadline = time.perf_counter() + ROUTE_TIME_BUDGET_SECONDS
+        start = min(cells, key=lambda cell: (_distance(cell, ENTRANCE), cell))
+        candidates = [
+            _serpentine(cells),
+            _serpentine(cells, by_column=True),
+            _nearest_neighbour(cells, start),
+        ]
+        route = min(candidates, key=path_length)
+        route = _two_opt(list(route), deadline)
+    else:
+        route = sorted(cells, key=lambda cell: _distance(cell, ENTRANCE))
+
+    return {
+        'sequence': [
+            {
+                'stop': index,
+                'row': row,
+                'column': column,
+                'location': f"R{row}C{column}",
+                'product_numbers': products_by_cell[(row, column)],
+            }
+            for index, (row, column) in enumerate(route, start=1)
+        ],
+        'total_distance': path_length(route),
+        'input_distance': input_distance,
+    }
@@ -0,0 +1,211 @@
+"""
+محرك البحث في المنتجات والأماكن
+- على PostgreSQL: يعتمد على فهارس pg_trgm (GIN) وترتيب حسب التشابه
+- على SQLite (بيئة التطوير): بحث icontains عادي بنفس ترتيب الأولويات
+- البحث بالاسم على العمود الموحد name_normalized (الهمزات والتاء المربوطة والتشكيل)
+- الأماكن: تحويل صيغ الإحداثيات (R3C5, R3, C12, 3-5) إلى بحث دقيق على الفهرس
+- اقتراحات "هل تقصد" للأرقام غير الموجودة باستعلام واحد لكل الطلب
+- حل ملفات الرموز الكبيرة (آلاف الأسطر) بربط واحد مع unnest
+"""
+import re
+from collections import namedtuple
+from difflib import get_close_matches
+
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField, Q, Exists, OuterRef
+
+from .models import Product, Location
+from .arabic import normalize_arabic
+
+
+# ترتيب الأولويات: تطابق تام لرقم المنتج، ثم بداية الرقم، ثم جزء من الرقم، ثم الاسم
+RANK_EXACT_NUMBER = 0
+RANK_PREFIX_NUMBER = 1
+RANK_CONTAINS_NUMBER = 2
+RANK_NAME = 3
+
+
+def is_postgresql():
+    """هل قاعدة البيانات الحالية PostgreSQL؟"""
+    return connection.vendor == 'postgresql'
+
+
+def ranked_product_search(query, queryset=None):
+    """
+    بحث مرتب في المنتجات برقم المنتج والاسم
+    يعيد QuerySet مرتباً: التطابق التام والبادئة في رقم المنتج أولاً ثم تشابه الاسم
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+
+    query = (query or '').strip()
+    if not query:
+        return queryset.none()
+
+    search_rank = Case(
+        When(product_number__iexact=query, then=Value(RANK_EXACT_NUMBER)),
+        When(product_number__istartswith=query, then=Value(RANK_PREFIX_NUMBER)),
+        When(product_number__icontains=query, then=Value(RANK_CONTAINS_NUMBER)),
+        default=Value(RANK_NAME),
+        output_field=IntegerField(),
+    )
+
+    # الاسم يُبحث فيه بعد التوحيد (أ/إ/آ -> ا، ة -> ه، بدون تشكيل) - انظر arabic.py
+    name_query = normalize_arabic(query)
+
+    if is_postgresql():
+        # UPPER(product_number) LIKE يخدمه فهرس gin_trgm_ops من migration 0009
+        # LIKE والمعامل % على name_normalized يخدمهما فهرس gin_trgm_ops من migration 0010
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return queryset.filter(
+            Q(product_number__icontains=query)
+            | Q(name_normalized__contains=name_query)
+            | Q(name_normalized__trigram_similar=name_query)
+        ).annotate(
+            search_rank=search_rank,
+            similarity=TrigramSimilarity('name_normalized', name_query),
+        ).order_by('search_rank', '-similarity', 'product_number')
+
+    # المسار البديل لـ SQLite
+    return queryset.filter(
+        Q(product_number__icontains=query) | Q(name_normalized__contains=name_query)
+    ).annotate(
+        search_rank=search_rank,
+    ).order_by('search_rank', 'product_number')
+
+
+SUGGESTIONS_PER_MISS = 3
+
+# لكل رقم غير موجود: أقرب أرقام المنتجات بتشابه trigram
+# المعامل % يستخدم فهرس gin_trgm_ops على UPPER(product_number) (migration 0009)
+SUGGESTIONS_SQL = """
+    SELECT m.query, s.product_number
+    FROM unnest(%s::text[]) AS m(query)
+    CROSS JOIN LATERAL (
+        SELECT p.product_number
+        FROM inventory_app_product p
+        WHERE UPPER(p.product_number::text) %% UPPER(m.query)
+        ORDER BY similarity(UPPER(p.product_number::text), UPPER(m.query)) DESC, p.product_number
+        LIMIT %s
+    ) s
+"""
+
+
+def suggest_product_numbers(missing_numbers, limit=SUGGESTIONS_PER_MISS):
+    """
+    اقتراح أقرب أرقام المنتجات الموجودة لكل رقم غير موجود
+    يعيد {الرقم: [اقتراحات]} - استعلام واحد مهما كان عدد الأرقام
+    """
+    missing_numbers = list(dict.fromkeys(n for n in missing_numbers if n))
+    if not missing_numbers:
+        return {}
+
+    suggestions = {number: [] for number in missing_numbers}
+
+    if is_postgresql():
+        with connection.cursor() as cursor:
+            cursor.execute(SUGGESTIONS_SQL, [missing_numbers, limit])
+            for query, product_number in cursor.fetchall():
+                suggestions[query].append(product_number)
+        return suggestions
+
+    # المسار البديل لـ SQLite: مسافة التحرير على فهرس الأرقام في الذاكرة
+    from .autocomplete import product_number_index
+
+    all_numbers = product_number_index.all_numbers()
+    for number in missing_numbers:
+        suggestions[number] = get_close_matches(number, all_numbers, n=limit, cutoff=0.6)
+    return suggestions
+
+
+# حل قائمة رموز كبيرة (ملف الماسح) بربط واحد: المصفوفة كاملة في معامل واحد
+# بدلاً من IN (...) بعشرات الآلاف من المعاملات
+RESOLVE_NUMBERS_SQL = """
+    SELECT p.product_number, p.name, p.quantity, l.row, l."column"
+    FROM unnest(%s::text[]) AS c(code)
+    JOIN inventory_app_product p ON p.product_number = c.code
+    LEFT JOIN inventory_app_location l ON l.id = p.location_id
+"""
+RESOLVE_CHUNK_SIZE = 500
+
+ResolvedProduct = namedtuple('ResolvedProduct', ['product_number', 'name', 'quantity', 'row', 'column'])
+
+
+def resolve_product_numbers(product_numbers):
+    """
+    إرجاع {رقم المنتج: ResolvedProduct} للأرقام الموجودة (تطابق تام)
+    على PostgreSQL: استعلام واحد مهما كان عدد الأرقام
+    """
+    product_numbers = list(dict.fromkeys(n for n in product_numbers if n))
+    if not product_numbers:
+        return {}
+
+    if is_postgresql():
+        with connection.cursor() as cursor:
+            cursor.execute(RESOLVE_NUMBERS_SQL, [product_numbers])
+            return {row[0]: ResolvedProduct(*row) for row in cursor.fetchall()}
+
+    # المسار البديل لـ SQLite: دفعات IN ضمن حد المعاملات
+    resolved = {}
+    for start in range(0, len(product_numbers), RESOLVE_CHUNK_SIZE):
+        rows = Product.objects.filter(
+            product_number__in=product_numbers[start:start + RESOLVE_CHUNK_SIZE]
+        ).values_list('product_number', 'name', 'quantity', 'location__row', 'location__column')
+        for row in rows:
+            resolved[row[0]] = ResolvedProduct(*row)
+    return resolved
+
+
+# R3C5 / R3-C5 / r3 c5 أو R3 أو C12
+LOCATION_CODE_RE = re.compile(r'^(?:R\s*(?P<row>\d+))?[\s\-_,]*(?:C\s*(?P<column>\d+))?$', re.IGNORECASE)
+# 3-5 / 3,5 / 3 5 (صف-عمود)
+LOCATION_PAIR_RE = re.compile(r'^(?P<row>\d+)\s*[\-_,\s/]\s*(?P<column>\d+)$')
+
+
+def parse_location_query(query):
+    """
+    تحويل نص البحث إلى إحداثيات (row, column) - أي منهما قد يكون None
+    الرقم المفرد يُرجع ('any', رقم) للبحث في الصف أو العمود
+    يعيد None إذا لم يكن النص إحداثيات
+    """
+    query = (query or '').strip()
+    if not query:
+        return None
+
+    if query.isdigit():
+        return ('any', int(query))
+
+    match = LOCATION_PAIR_RE.match(query)
+    if match:
+        return (int(match.group('row')), int(match.group('column')))
+
+    match = LOCATION_CODE_RE.match(query)
+    if match and (match.group('row') or match.group('column')):
+        row = match.group('row')
+        column = match.group('column')
+        return (int(row) if row else None, int(column) if column else None)
+
+    return None
+
+
+def location_search(query):
+    """
+    بحث دقيق في الأماكن حسب الإحداثيات - استعلام واحد مع حالة الإشغال واسم المستودع
+    """
+    parsed = parse_location_query(query)
+    if parsed is None:
+        return Location.objects.none()
+
+    locations = Location.objects.select_related('warehouse').annotate(
+        has_product=Exists(Product.objects.filter(location=OuterRef('pk')))
+    )
+
+    first, second = parsed
+    if first == 'any':
+        return locations.filter(Q(row=second) | Q(column=second))
+    if first is not None:
+        locations = locations.filter(row=first)
+    if second is not None:
+        locations = locations.filter(column=second)
+    return locations
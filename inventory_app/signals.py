@@ -0,0 +1,87 @@
+"""
+إشارات التطبيق - تحافظ على تزامن الفهارس في الذاكرة مع قاعدة البيانات
+تُطبق التعديلات بعد نجاح المعاملة (data_versions.mark_changed) حتى لا تظهر بيانات تم التراجع عنها
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Product, Location, Warehouse, Order
+from .product_cache import product_cache
+from .autocomplete import product_number_index
+from .data_versions import mark_changed, PRODUCTS, LOCATIONS, WAREHOUSES, ORDERS
+from .arabic import normalize_arabic
+
+
+@receiver(pre_save, sender=Product)
+def product_normalize_name(sender, instance, raw=False, **kwargs):
+    """الحفظ الخام (استيراد نسخة احتياطية) لا يمر بـ Product.save - نحسب الاسم الموحد هنا"""
+    if raw:
+        instance.name_normalized = normalize_arabic(instance.name)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    """تفريغ سجل المنتج من الفهرس بعد الحفظ - يُعاد تحميله من قاعدة البيانات عند الطلب"""
+    product_cache.discard_product(instance.id)
+
+
+@receiver(post_save, sender=Product)
+def product_number_saved(sender, instance, created, raw=False, **kwargs):
+    """تحديث فهرس الإكمال التلقائي عند إضافة منتج أو تغيير رقمه"""
+    new_number = instance.product_number
+    old_number = getattr(instance, '_loaded_product_number', None)
+    instance._loaded_product_number = new_number
+    
+    if raw or (not created and old_number is None):
+        # استيراد نسخة احتياطية أو لا نعرف الرقم السابق - سطر إعادة بناء واحد لكل المعاملة
+        product_number_index.invalidate()
+    elif created:
+        product_number_index.numbers_changed(new_number)
+    elif old_number != new_number:
+        product_number_index.numbers_changed(old_number, new_number)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    product_cache.discard_product(instance.id)
+    product_number_index.numbers_changed(instance.product_number)
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, raw=False, **kwargs):
+    """تفريغ سجلات منتجات الموقع بعد تعديل بياناته (الصف/العمود/الملاحظات)"""
+    product_cache.discard_location(instance.id)
+
+
+@receiver(post_delete, sender=Location)
+def location_deleted(sender, instance, **kwargs):
+    product_cache.discard_location(instance.id)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    """ملخص الطلبيات يُحدث تدريجياً عند الإنشاء فقط - الحذف يتطلب إعادة بنائه"""
+    mark_changed(ORDERS)
+
+
+# ========== عدادات إصدار الجداول (ETag) ==========
+# مستقبل لكل نموذج (sender): المستقبل بدون sender يُربط بكل النماذج فيمنع Django من الحذف السريع
+# (DELETE مباشر) لأي جدول ويرسل إشارة لكل صف. mark_changed يرفع العداد مرة واحدة لكل معاملة
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_table_changed(sender, **kwargs):
+    mark_changed(PRODUCTS)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def location_table_changed(sender, **kwargs):
+    mark_changed(LOCATIONS)
+
+
+@receiver(post_save, sender=Warehouse)
+@receiver(post_delete, sender=Warehouse)
+def warehouse_table_changed(sender, **kwargs):
+    mark_changed(WAREHOUSES)
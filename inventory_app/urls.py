@@ -6,13 +6,21 @@ app_name = 'inventory_app'
 urlpatterns = [
     path('', views.home, name='home'),
     path('api/search/', views.search_products, name='search_products'),
+    path('api/search/cache-stats/', views.search_cache_stats, name='search_cache_stats'),
+    path('api/search/resolve-file/', views.resolve_codes_file, name='resolve_codes_file'),
     path('api/confirm-products/', views.confirm_products, name='confirm_products'),
+    path('api/confirm-products/jobs/<uuid:ticket>/', views.confirmation_job_status, name='confirmation_job_status'),
+    path('api/waves/plan/', views.wave_plan, name='wave_plan'),
+    path('api/waves/confirm/', views.wave_confirm, name='wave_confirm'),
     path('api/products/', views.get_products_list, name='products_list'),
     path('api/get-stats/', views.get_stats, name='get_stats'),
     
     # البحث السريع
     path('api/search-products/', views.quick_search_products, name='quick_search_products'),
     path('api/search-locations/', views.quick_search_locations, name='quick_search_locations'),
+    path('api/autocomplete/', views.autocomplete_products, name='autocomplete_products'),
+    path('api/autocomplete/stats/', views.autocomplete_stats, name='autocomplete_stats'),
+    path('api/products/typeahead/', views.product_typeahead, name='product_typeahead'),
     
     # إدارة المستودع
     path('manage/', views.manage_warehouse, name='manage_warehouse'),
@@ -38,6 +46,8 @@ urlpatterns = [
     # تصدير البيانات
     path('export/products/excel/', views.export_products_excel, name='export_products_excel'),
     path('export/products/pdf/', views.export_products_pdf, name='export_products_pdf'),
+    path('export/orders/', views.export_orders, name='export_orders'),
+    path('export/returns/', views.export_returns, name='export_returns'),
     
     # إدارة المستودعات
     path('warehouses/', views.warehouses_list, name='warehouses_list'),
@@ -75,6 +85,7 @@ urlpatterns = [
     path('returns/add/', views.add_return, name='add_return'),
     path('returns/<int:return_id>/', views.return_detail, name='return_detail'),
     path('api/process-return/', views.process_return, name='process_return'),
+    path('api/returns/import/', views.import_returns_file, name='import_returns_file'),
     
     # تصفير الكميات
     path('api/reset-all-quantities/', views.reset_all_quantities, name='reset_all_quantities'),
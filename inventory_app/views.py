@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
@@ -8,9 +8,26 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
 from django.db import models as db_models
-from .models import Product, Location, Warehouse, AuditLog, DailyReportArchive, Order, ProductReturn, UserProfile, UserActivityLog
-from .decorators import admin_required, staff_required, exclude_maintenance, exclude_admin_dashboard, get_user_type, is_admin
+from .models import Product, Location, Warehouse, AuditLog, DailyReportArchive, Order, ProductReturn, UserProfile, UserActivityLog, ConfirmationJob
+from .decorators import admin_required, staff_required, exclude_maintenance, exclude_admin_dashboard, get_user_type, is_admin, data_version_etag, idempotent
+from .data_versions import PRODUCTS, LOCATIONS, WAREHOUSES
 from .forms import LoginForm, RegisterStaffForm, ProductForm, EditStaffForm
+from .search import ranked_product_search, location_search, suggest_product_numbers, resolve_product_numbers
+from .product_cache import product_cache
+from .autocomplete import product_number_index
+from .pagination import keyset_paginate, parse_page_size, InvalidCursor
+from .deductions import apply_deductions, DeductionError
+from .routing import optimize_pick_route
+from .waves import plan_wave, confirm_wave, WaveError
+from .confirmation_queue import enqueue_confirmation, QueueError
+from .order_summary import get_orders_summary
+from .document_numbers import next_number, ORDER as ORDER_PREFIX
+from .returns import create_product_return, read_return_file, validate_product_numbers, ReturnError
+from .return_statistics import get_return_statistics, rebuild_return_statistics
+from .exports import EchoBuffer, parse_date_range, order_rows, return_rows, stream_csv, write_xlsx, ORDER_HEADERS, RETURN_HEADERS
+from .order_lines import create_order_lines, rebuild_order_lines, rebuild_return_lines
+import csv
+import io
 import json
 import logging
 from django.core import serializers
@@ -18,6 +35,7 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from django.views.decorators.cache import never_cache
 from django.conf import settings
+from urllib.parse import urlencode
 
 # إعداد Logger للأمان
 security_logger = logging.getLogger('inventory_app.security')
@@ -58,6 +76,7 @@ def home(request):
 
 @csrf_exempt
 @transaction.atomic
+@idempotent('confirm_products')
 def confirm_products(request):
     """تأكيد أخذ المنتجات وخصم الكميات"""
     if request.method == 'POST':
@@ -66,89 +85,45 @@ def confirm_products(request):
             products_list = data.get('products', [])
             recipient_name = data.get('recipient_name', '').strip()
             
-            # Extract product numbers for efficient batch query
-            product_numbers = [item.get('number', '').strip() for item in products_list if item.get('number', '').strip()]
+            username = request.user.username if request.user.is_authenticated else 'Guest'
             
-            # Optimize: Batch query with select_for_update to lock rows
-            products_dict = {
-                p.product_number: p 
-                for p in Product.objects.filter(product_number__in=product_numbers).select_for_update()
-            }
-            
-            updated_products = []
-            
-            for item in products_list:
-                product_number = item.get('number', '').strip()
-                requested_quantity = int(item.get('quantity', 0))
-                
-                # Fast lookup
-                product = products_dict.get(product_number)
-                
-                if not product:
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'المنتج {product_number} غير موجود'
-                    })
-                
-                old_quantity = product.quantity
-                
-                # إذا كانت الكمية المطلوبة 0، نسجل العملية فقط بدون خصم
-                if requested_quantity == 0:
-                    # تسجيل العملية في السجل بدون خصم الكمية
-                    AuditLog.objects.create(
-                        action='quantity_taken',
-                        product=product,
-                        product_number=product_number,
-                        quantity_before=old_quantity,
-                        quantity_after=old_quantity,
-                        quantity_change=0,
-                        notes=f'تم البحث عن المنتج بدون سحب كمية (كمية 0)',
-                        user=request.user.username if request.user.is_authenticated else 'Guest'
-                    )
-                    
-                    updated_products.append({
-                        'product_number': product_number,
-                        'old_quantity': old_quantity,
-                        'new_quantity': old_quantity,
-                        'quantity_taken': 0
-                    })
-                # إذا كانت الكمية المطلوبة أكبر من 0، نتحقق ونخصم
-                elif product.quantity >= requested_quantity:
-                    product.quantity -= requested_quantity
-                    product.save()
-                    
-                    # تسجيل العملية في السجل
-                    AuditLog.objects.create(
-                        action='quantity_taken',
-                        product=product,
-                        product_number=product_number,
-                        quantity_before=old_quantity,
-                        quantity_after=product.quantity,
-                        quantity_change=-requested_quantity,
-                        notes=f'تم سحب {requested_quantity} من المنتج',
-                        user=request.user.username if request.user.is_authenticated else 'Guest'
-                    )
-                    
-                    updated_products.append({
-                        'product_number': product_number,
-                        'old_quantity': old_quantity,
-                        'new_quantity': product.quantity,
-                        'quantity_taken': requested_quantity
-                    })
-                else:
+            # الوضع غير المتزامن: حفظ الطلب في قائمة الانتظار وإرجاع رقم التذكرة فوراً
+            if data.get('queued', settings.CONFIRM_PRODUCTS_QUEUED):
+                try:
+                    job = enqueue_confirmation(data, username)
+                except QueueError as e:
                     return JsonResponse({
                         'success': False,
-                        'error': f'الكمية غير كافية للمنتج {product_number}'
+                        'error': str(e),
+                        'errors': e.errors
                     })
+                return JsonResponse({
+                    'success': True,
+                    'queued': True,
+                    'ticket': str(job.ticket),
+                    'status': job.status,
+                    'message': 'تم استلام الطلب وسيتم تنفيذه خلال لحظات'
+                }, status=202)
+            
+            lines = [
+                (item.get('number', '').strip(), int(item.get('quantity', 0)))
+                for item in products_list
+            ]
+            
+            # التحقق من كل الأسطر أولاً ثم خصم جماعي - كل شيء أو لا شيء
+            try:
+                updated_products = apply_deductions(lines, username)
+            except DeductionError as e:
+                return JsonResponse({
+                    'success': False,
+                    'error': str(e),
+                    'errors': e.errors
+                })
             
             # حفظ الطلبية في السجل
             if updated_products:
-                from datetime import datetime
-                import random
-                import string
-                
                 # إنشاء رقم طلبية فريد
-                order_number = f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}-{''.join(random.choices(string.ascii_uppercase + string.digits, k=4))}"
+                order_number = next_number(ORDER_PREFIX)
                 
                 # حساب الإجماليات
                 total_products = len(updated_products)
@@ -161,8 +136,9 @@ def confirm_products(request):
                     total_products=total_products,
                     total_quantities=total_quantities,
                     recipient_name=recipient_name or None,
-                    user=request.user.username if request.user.is_authenticated else 'Guest'
+                    user=username
                 )
+                create_order_lines(order)
                 
                 return JsonResponse({
                     'success': True,
@@ -171,7 +147,14 @@ def confirm_products(request):
                     'order_number': order_number
                 })
             
+            return JsonResponse({
+                'success': False,
+                'error': 'لا توجد منتجات للتأكيد'
+            })
+            
         except Exception as e:
+            # الاستجابة ليست استثناء - نلغي المعاملة يدوياً حتى لا يُحفظ خصم جزئي
+            transaction.set_rollback(True)
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -180,79 +163,329 @@ def confirm_products(request):
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
 
+@require_http_methods(["GET"])
+def confirmation_job_status(request, ticket):
+    """حالة طلب تأكيد في قائمة الانتظار - النتيجة بنفس صيغة استجابة confirm_products"""
+    job = ConfirmationJob.objects.filter(ticket=ticket).only(
+        'ticket', 'status', 'order_number', 'result'
+    ).first()
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'رقم التذكرة غير موجود'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'ticket': str(job.ticket),
+        'status': job.status,
+        'order_number': job.order_number,
+        'result': job.result,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def wave_plan(request):
+    """تخطيط دفعة التقاط: دمج عدة قوائم وفحص المخزون ومسار موحد (بدون أي كتابة)"""
+    try:
+        data = json.loads(request.body)
+        plan = plan_wave(data.get('pick_lists'))
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'خطأ في قراءة البيانات'}, status=400)
+    except WaveError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, **plan}, json_dumps_params={'ensure_ascii': False})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@transaction.atomic
+@idempotent('wave_confirm')
+def wave_confirm(request):
+    """تأكيد دفعة التقاط: خصم جماعي + طلبية لكل مستلم في معاملة واحدة"""
+    try:
+        data = json.loads(request.body)
+        username = request.user.username if request.user.is_authenticated else 'Guest'
+        result = confirm_wave(data.get('pick_lists'), username)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'خطأ في قراءة البيانات'}, status=400)
+    except WaveError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except DeductionError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'errors': e.errors})
+    except Exception as e:
+        transaction.set_rollback(True)
+        logger.error(f'Error confirming wave: {str(e)}')
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    
+    logger.info(f"Wave confirmed: {result['wave_number']} by {username}, Orders: {len(result['orders'])}")
+    
+    return JsonResponse({
+        'success': True,
+        'message': f"تم خصم {len(result['updated_products'])} سطر وإنشاء {len(result['orders'])} طلبية",
+        **result
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+# حجم الدفعة لكل استعلام IN في وضع البث
+SEARCH_STREAM_CHUNK_SIZE = 500
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def _search_result(product_number, requested_quantity, product, suggestions=None):
+    """بناء نتيجة بحث لرقم منتج واحد من سجل فهرس البحث"""
+    if not product:
+        return {
+            'product_number': product_number,
+            'requested_quantity': requested_quantity,
+            'found': False,
+            'error': 'المنتج غير موجود في قاعدة البيانات',
+            'suggestions': (suggestions or {}).get(product_number, []),
+        }
+    
+    locations_data = []
+    if product.location_id:
+        # نفس صيغة Location.full_location و get_grid_position
+        locations_data.append({
+            'id': product.location_id,
+            'full_location': f"R{product.row}C{product.column}",
+            'row': product.row,
+            'column': product.column,
+            'x': product.column,
+            'y': product.row,
+            'notes': product.notes,
+        })
+    
+    result = {
+        'product_number': product.product_number,
+        'name': product.name,
+        'category': product.category,
+        'quantity': product.quantity,
+        'locations': locations_data,
+        'found': True,
+    }
+    
+    if requested_quantity > 0:
+        result['requested_quantity'] = requested_quantity
+    
+    return result
+
+
+def _parse_search_items(products_list):
+    """تحويل قائمة الطلب إلى أزواج (رقم المنتج، الكمية) مع تجاهل الأرقام الفارغة"""
+    items = []
+    for item in products_list:
+        product_number = item.get('product_number', '').strip()
+        requested_quantity = int(item.get('quantity', 0))
+        
+        if not product_number:
+            continue
+        
+        items.append((product_number, requested_quantity))
+    return items
+
+
+def _route_stops(results):
+    """محطات مسار الالتقاط من نتائج البحث الموجودة والمرتبطة بموقع"""
+    return [
+        (result['product_number'], result['locations'][0]['row'], result['locations'][0]['column'])
+        for result in results
+        if result['found'] and result['locations']
+    ]
+
+
+def _stream_search_results(items, optimize_route=False):
+    """
+    توليد النتائج سطراً بسطر (NDJSON) مع استعلام IN لكل دفعة ثابتة الحجم
+    مع optimize_route: سطر أخير {"route": ...} بعد كل النتائج
+    """
+    stops = []
+    for start in range(0, len(items), SEARCH_STREAM_CHUNK_SIZE):
+        chunk = items[start:start + SEARCH_STREAM_CHUNK_SIZE]
+        products_dict = product_cache.get_many([number for number, _ in chunk])
+        suggestions = suggest_product_numbers([number for number, _ in chunk if number not in products_dict])
+        
+        results = [
+            _search_result(product_number, requested_quantity, products_dict.get(product_number), suggestions)
+            for product_number, requested_quantity in chunk
+        ]
+        if optimize_route:
+            stops.extend(_route_stops(results))
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+    
+    if optimize_route:
+        yield json.dumps({'route': optimize_pick_route(stops)}, ensure_ascii=False) + '\n'
+
+
 @csrf_exempt
 def search_products(request):
     """البحث عن المنتجات من خلال أرقامهم"""
     if request.method == 'POST':
         data = json.loads(request.body)
-        products_list = data.get('products', [])
+        items = _parse_search_items(data.get('products', []))
+        optimize_route = bool(data.get('optimize_route'))
         
-        # Extract product numbers for efficient batch query
-        product_numbers = [item.get('product_number', '').strip() for item in products_list if item.get('product_number', '').strip()]
+        # وضع البث للقوائم الكبيرة: Accept: application/x-ndjson
+        if NDJSON_CONTENT_TYPE in request.headers.get('Accept', ''):
+            response = StreamingHttpResponse(_stream_search_results(items, optimize_route), content_type=NDJSON_CONTENT_TYPE)
+            response['X-Accel-Buffering'] = 'no'  # منع تجميع الاستجابة في nginx
+            return response
         
-        # Optimize: Use select_related to avoid N+1 queries and batch query
-        products = Product.objects.filter(product_number__in=product_numbers).select_related('location')
+        # الفهرس في الذاكرة - قاعدة البيانات فقط للأرقام غير المخزنة
+        products_dict = product_cache.get_many([number for number, _ in items])
         
-        # Create a dictionary for fast lookup
-        products_dict = {p.product_number: p for p in products}
+        # اقتراحات "هل تقصد" لكل الأرقام غير الموجودة باستعلام واحد
+        suggestions = suggest_product_numbers([number for number, _ in items if number not in products_dict])
         
-        results = []
+        results = [
+            _search_result(product_number, requested_quantity, products_dict.get(product_number), suggestions)
+            for product_number, requested_quantity in items
+        ]
         
-        for item in products_list:
-            product_number = item.get('product_number', '').strip()
-            requested_quantity = int(item.get('quantity', 0))
-            
-            if not product_number:
-                continue
-            
-            # Fast lookup from dictionary
-            product = products_dict.get(product_number)
-            
-            if product:
-                locations_data = []
-                if product.location:
-                    grid_pos = product.location.get_grid_position()
-                    locations_data.append({
-                        'id': product.location.id,
-                        'full_location': product.location.full_location,
-                        'row': product.location.row,
-                        'column': product.location.column,
-                        'x': grid_pos['x'],
-                        'y': grid_pos['y'],
-                        'notes': product.location.notes,
-                    })
-                
-                result = {
-                    'product_number': product.product_number,
-                    'name': product.name,
-                    'category': product.category,
-                    'quantity': product.quantity,
-                    'locations': locations_data,
-                    'found': True,
-                }
-                
-                if requested_quantity > 0:
-                    result['requested_quantity'] = requested_quantity
-                
-                results.append(result)
-            else:
-                results.append({
-                    'product_number': product_number,
-                    'requested_quantity': requested_quantity,
-                    'found': False,
-                    'error': 'المنتج غير موجود في قاعدة البيانات'
-                })
+        response_data = {'results': results}
+        # ترتيب مسار الالتقاط على الشبكة بدلاً من ترتيب الإدخال
+        if optimize_route:
+            response_data['route'] = optimize_pick_route(_route_stops(results))
         
-        return JsonResponse({'results': results}, json_dumps_params={'ensure_ascii': False})
+        return JsonResponse(response_data, json_dumps_params={'ensure_ascii': False})
     
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
 
+BULK_RESOLVE_MAX_CODES = 200000
+BULK_RESOLVE_HEADERS = ['الرمز', 'موجود', 'اسم المنتج', 'الكمية', 'الموقع', 'الخط (Row)', 'العمود (Column)']
+# أسماء أعمدة العنوان الشائعة في ملفات الماسح (يُتجاهل السطر الأول إذا كان أحدها)
+BULK_RESOLVE_HEADER_NAMES = {'code', 'barcode', 'product_number', 'الرمز', 'الباركود', 'رقم المنتج'}
+
+
+def _read_codes_file(uploaded_file):
+    """قراءة الرموز من ملف نصي أو CSV (العمود الأول من كل سطر)"""
+    text = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', errors='replace', newline='')
+    codes = []
+    for index, row in enumerate(csv.reader(text)):
+        if not row:
+            continue
+        code = row[0].strip()
+        if not code:
+            continue
+        if index == 0 and code.lower() in BULK_RESOLVE_HEADER_NAMES:
+            continue
+        codes.append(code)
+        if len(codes) > BULK_RESOLVE_MAX_CODES:
+            break
+    return codes
+
+
+def _stream_resolved_codes(codes, resolved):
+    """توليد ملف CSV سطراً لكل رمز بنفس ترتيب الملف الأصلي"""
+    writer = csv.writer(EchoBuffer())
+    yield '\ufeff' + writer.writerow(BULK_RESOLVE_HEADERS)  # BOM ليفتح Excel النص العربي بشكل صحيح
+    for code in codes:
+        product = resolved.get(code)
+        if product is None:
+            yield writer.writerow([code, 'لا', '', '', '', '', ''])
+            continue
+        location = f"R{product.row}C{product.column}" if product.row is not None else ''
+        yield writer.writerow([
+            code, 'نعم', product.name, product.quantity, location,
+            product.row if product.row is not None else '',
+            product.column if product.column is not None else '',
+        ])
+
+
+@login_required
+@csrf_exempt
+@require_http_methods(["POST"])
+def resolve_codes_file(request):
+    """
+    حل ملف رموز من الماسح (نص أو CSV) دفعة واحدة
+    يعيد ملف CSV: لكل رمز هل هو موجود واسمه وكميته وموقعه
+    """
+    uploaded_file = request.FILES.get('codes_file')
+    if uploaded_file is None:
+        return JsonResponse({'success': False, 'error': 'لم يتم إرسال ملف'}, status=400)
+    
+    codes = _read_codes_file(uploaded_file)
+    if not codes:
+        return JsonResponse({'success': False, 'error': 'الملف لا يحتوي على رموز'}, status=400)
+    if len(codes) > BULK_RESOLVE_MAX_CODES:
+        return JsonResponse({
+            'success': False,
+            'error': f'عدد الرموز يتجاوز الحد الأقصى ({BULK_RESOLVE_MAX_CODES})'
+        }, status=400)
+    
+    resolved = resolve_product_numbers(codes)
+    found_count = sum(1 for code in codes if code in resolved)
+    
+    response = StreamingHttpResponse(_stream_resolved_codes(codes, resolved), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="codes_resolved.csv"'
+    response['X-Codes-Total'] = str(len(codes))
+    response['X-Codes-Found'] = str(found_count)
+    return response
+
+
+@login_required
 @require_http_methods(["GET"])
+def search_cache_stats(request):
+    """إحصائيات فهرس البحث في الذاكرة (hit/miss) لمعرفة الحجم المناسب"""
+    return JsonResponse(product_cache.stats())
+
+
+# الحقول المتاحة في API الكتالوج: اسم الحقل في الاستجابة -> أعمدة قاعدة البيانات
+CATALOG_FIELDS = {
+    'id': ['id'],
+    'number': ['product_number'],
+    'name': ['name'],
+    'category': ['category'],
+    'description': ['description'],
+    'quantity': ['quantity'],
+    'location': ['location__row', 'location__column'],
+    'updated_at': ['updated_at'],
+}
+CATALOG_DEFAULT_FIELDS = ['number', 'name']
+
+
+@require_http_methods(["GET"])
+@data_version_etag(PRODUCTS, LOCATIONS)
 def get_products_list(request):
-    products = Product.objects.all()[:100]
-    products_data = [{'number': p.product_number, 'name': p.name} for p in products]
-    return JsonResponse({'products': products_data}, json_dumps_params={'ensure_ascii': False})
+    """
+    API كتالوج المنتجات - ترقيم بالمؤشر على رقم المنتج
+    ?after=<cursor>&page_size=100&fields=number,name,quantity,location
+    """
+    requested_fields = [f.strip() for f in request.GET.get('fields', '').split(',') if f.strip()]
+    fields = [f for f in requested_fields if f in CATALOG_FIELDS] or CATALOG_DEFAULT_FIELDS
+    
+    # product_number مطلوب دائماً لمؤشر الصفحة
+    columns = {'product_number'}
+    for field in fields:
+        columns.update(CATALOG_FIELDS[field])
+    
+    products = Product.objects.order_by('product_number').values(*columns)
+    
+    try:
+        page = keyset_paginate(
+            products,
+            after=request.GET.get('after'),
+            page_size=parse_page_size(request.GET.get('page_size')),
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400, json_dumps_params={'ensure_ascii': False})
+    
+    products_data = []
+    for row in page:
+        item = {}
+        for field in fields:
+            if field == 'location':
+                item['location'] = f"R{row['location__row']}C{row['location__column']}" if row['location__row'] else None
+            else:
+                item[field] = row[CATALOG_FIELDS[field][0]]
+        products_data.append(item)
+    
+    return JsonResponse({
+        'products': products_data,
+        'next_cursor': page.next_cursor,
+        'page_size': page.page_size,
+    }, json_dumps_params={'ensure_ascii': False})
 
 
 def manage_warehouse(request):
@@ -265,6 +498,7 @@ def manage_warehouse(request):
 
 
 @require_http_methods(["GET"])
+@data_version_etag(WAREHOUSES, LOCATIONS, PRODUCTS)
 def get_warehouse_grid(request):
     """الحصول على شبكة المستودع"""
     warehouse = Warehouse.objects.first()
@@ -460,30 +694,47 @@ def warehouse_dashboard(request):
 
 
 def products_list(request):
-    """قائمة جميع المنتجات"""
+    """قائمة المنتجات - ترقيم بالمؤشر (keyset) على رقم المنتج"""
     # Optimize query with select_related to avoid N+1 queries
-    products = Product.objects.select_related('location').all().order_by('product_number')
+    products = Product.objects.select_related('location').order_by('product_number')
     
     # احسب العدد الإجمالي قبل أي فلترة
-    total_count = products.count()
+    total_count = Product.objects.count()
     
     search = request.GET.get('search', '')
     if search:
-        products = products.filter(
-            product_number__icontains=search
-        ) | products.filter(
-            name__icontains=search
-        )
+        # بحث مرتب مدعوم بفهارس trigram
+        products = ranked_product_search(search, products)
     
     # احسب العدد بعد الفلترة (إذا كان هناك بحث)
     filtered_count = products.count() if search else total_count
     
-    # عرض جميع المنتجات بدون تقسيم
+    page_size = parse_page_size(request.GET.get('page_size'))
+    try:
+        page = keyset_paginate(
+            products,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size,
+        )
+    except InvalidCursor:
+        page = keyset_paginate(products, page_size=page_size)
+    
+    def page_url(**cursor):
+        params = {'page_size': page_size, **cursor}
+        if search:
+            params['search'] = search
+        return '?' + urlencode(params)
+    
     return render(request, 'inventory_app/products_list.html', {
-        'products': products,
+        'products': page,
         'search': search,
         'total_count': total_count,
-        'filtered_count': filtered_count
+        'filtered_count': filtered_count,
+        'page_size': page_size,
+        'page_size_choices': [50, 100, 200, 500],
+        'next_url': page_url(after=page.next_cursor) if page.has_next else None,
+        'previous_url': page_url(before=page.previous_cursor) if page.has_previous else None,
     })
 
 
@@ -998,6 +1249,7 @@ def locations_list(request):
 
 
 @require_http_methods(["GET"])
+@data_version_etag(PRODUCTS, LOCATIONS, WAREHOUSES)
 def get_stats(request):
     """API للحصول على إحصائيات النظام"""
     try:
@@ -1044,6 +1296,7 @@ def get_stats(request):
 
 
 @require_http_methods(["GET"])
+@data_version_etag(PRODUCTS, LOCATIONS)
 def quick_search_products(request):
     """API للبحث السريع في المنتجات"""
     try:
@@ -1053,12 +1306,8 @@ def quick_search_products(request):
         if not query:
             return JsonResponse([], safe=False, json_dumps_params={'ensure_ascii': False})
         
-        # البحث في رقم المنتج واسمه
-        products = Product.objects.filter(
-            product_number__icontains=query
-        ) | Product.objects.filter(
-            name__icontains=query
-        )
+        # البحث في رقم المنتج واسمه (التطابق التام والبادئة أولاً)
+        products = ranked_product_search(query, Product.objects.select_related('location'))
         
         products = products[:10]  # أول 10 نتائج
         
@@ -1078,33 +1327,105 @@ def quick_search_products(request):
 
 
 @require_http_methods(["GET"])
+def autocomplete_products(request):
+    """API الإكمال التلقائي لأرقام المنتجات من فهرس الذاكرة"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 50))
+    except (TypeError, ValueError):
+        limit = 10
+    
+    results = product_number_index.complete(query, limit=limit)
+    return JsonResponse(results, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+TYPEAHEAD_DEFAULT_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+
+
+@require_http_methods(["GET"])
+def product_typeahead(request):
+    """
+    منتقي المنتجات (نموذج المرتجع): أرقام تبدأ بالنص مع الاسم والكمية والموقع
+    ?q=BAG&limit=10&after=<آخر رقم> - الأرقام من فهرس الإكمال في الذاكرة، والبيانات من قاعدة البيانات
+    إذا لم يطابق أي رقم نبحث في الأسماء (صفحة واحدة)
+    """
+    query = request.GET.get('q', '').strip()
+    after = request.GET.get('after', '').strip() or None
+    limit = parse_page_size(request.GET.get('limit'), default=TYPEAHEAD_DEFAULT_LIMIT, maximum=TYPEAHEAD_MAX_LIMIT)
+    if not query:
+        return JsonResponse({'results': [], 'next': None})
+    
+    # limit + 1 لمعرفة وجود صفحة تالية
+    numbers = product_number_index.complete(query, limit=limit + 1, after=after)
+    has_next = len(numbers) > limit
+    numbers = numbers[:limit]
+    
+    if numbers:
+        # الكمية من قاعدة البيانات (استعلام واحد للصفحة) - الفهرس في الذاكرة للأرقام فقط
+        rows = {
+            row['product_number']: row
+            for row in Product.objects.filter(product_number__in=numbers).values(
+                'product_number', 'name', 'quantity', 'location__row', 'location__column'
+            )
+        }
+        results = [
+            {
+                'number': row['product_number'],
+                'name': row['name'],
+                'quantity': row['quantity'],
+                'location': f"R{row['location__row']}C{row['location__column']}" if row['location__row'] is not None else None,
+            }
+            for row in (rows.get(number) for number in numbers) if row is not None
+        ]
+    elif after is None:
+        products = ranked_product_search(query, Product.objects.select_related('location'))[:limit]
+        results = [
+            {
+                'number': product.product_number,
+                'name': product.name,
+                'quantity': product.quantity,
+                'location': product.location.full_location if product.location else None,
+            }
+            for product in products
+        ]
+    else:
+        results = []
+    
+    return JsonResponse({
+        'results': results,
+        'next': numbers[-1] if has_next else None,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+@require_http_methods(["GET"])
+def autocomplete_stats(request):
+    """حجم فهرس الإكمال التلقائي في الذاكرة ووقت إعادة بنائه"""
+    return JsonResponse(product_number_index.stats())
+
+
+@require_http_methods(["GET"])
+@data_version_etag(LOCATIONS, WAREHOUSES, PRODUCTS)
 def quick_search_locations(request):
     """API للبحث السريع في الأماكن"""
     try:
-        from .models import Location
         query = request.GET.get('q', '').strip()
         
         if not query:
             return JsonResponse([], safe=False, json_dumps_params={'ensure_ascii': False})
         
-        # البحث في المواقع (R1C1, R2C3, etc.)
-        locations = Location.objects.filter(
-            row__icontains=query
-        ) | Location.objects.filter(
-            column__icontains=query
-        )
-        
-        locations = locations[:10]  # أول 10 نتائج
+        # البحث في المواقع (R1C1, R3, C12, 3-5) - استعلام واحد مع الإشغال واسم المستودع
+        locations = location_search(query)[:10]  # أول 10 نتائج
         
         results = []
         for location in locations:
-            has_product = location.products.exists()
             results.append({
                 'id': location.id,
                 'full_location': location.full_location,
                 'row': location.row,
                 'column': location.column,
-                'has_product': has_product,
+                'has_product': location.has_product,
                 'warehouse': location.warehouse.name if location.warehouse else ''
             })
         
@@ -1391,6 +1712,49 @@ def export_products_excel(request):
     return response
 
 
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+
+def _export_lines(request, filename, title, headers, rows_func):
+    """تصدير سطر لكل منتج: ?format=csv|xlsx&from=YYYY-MM-DD&to=YYYY-MM-DD"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'success': False, 'error': 'صيغة التصدير غير مدعومة'}, status=400)
+    try:
+        start, end = parse_date_range(request.GET)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'نطاق التاريخ غير صالح'}, status=400)
+    
+    rows = rows_func(start, end)
+    if export_format == 'xlsx':
+        return FileResponse(
+            write_xlsx(title, headers, rows),
+            as_attachment=True,
+            filename=f'{filename}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    
+    response = StreamingHttpResponse(stream_csv(headers, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+@login_required
+@staff_required
+@require_http_methods(["GET"])
+def export_orders(request):
+    """تصدير الطلبيات المسحوبة (سطر لكل منتج) إلى CSV أو Excel"""
+    return _export_lines(request, 'orders', 'الطلبات', ORDER_HEADERS, order_rows)
+
+
+@login_required
+@staff_required
+@require_http_methods(["GET"])
+def export_returns(request):
+    """تصدير المرتجعات (سطر لكل منتج) إلى CSV أو Excel"""
+    return _export_lines(request, 'returns', 'المرتجعات', RETURN_HEADERS, return_rows)
+
+
 def daily_reports(request):
     """صفحة التقارير اليومية السريعة"""
     from datetime import datetime, timedelta
@@ -1852,6 +2216,8 @@ def import_backup(request):
                 AuditLog.objects.all().delete()
                 ProductReturn.objects.all().delete()
                 Order.objects.all().delete()
+                # تفريغ فهرس الإكمال التلقائي أولاً حتى لا يُحذف كل رقم منه على حدة
+                product_number_index.invalidate()
                 Product.objects.all().delete()
                 Location.objects.all().delete()
                 Warehouse.objects.all().delete()
@@ -1924,15 +2290,25 @@ def import_backup(request):
                 for obj in objects:
                     obj.save()
             
+            # أسطر الطلبيات والمرتجعات لا تُصدَّر - تُبنى من products_data بعد الاستيراد
             if 'orders' in data:
                 objects = serializers.deserialize('json', json.dumps(data['orders']))
+                imported_orders = []
                 for obj in objects:
                     obj.save()
+                    imported_orders.append(obj.object)
+                rebuild_order_lines(imported_orders)
             
             if 'returns' in data:
                 objects = serializers.deserialize('json', json.dumps(data['returns']))
+                imported_returns = []
                 for obj in objects:
                     obj.save()
+                    imported_returns.append(obj.object)
+                rebuild_return_lines(imported_returns)
+            if clear_existing or 'returns' in data:
+                # المرتجعات المستعادة لا تمر بـ create_product_return
+                rebuild_return_statistics()
             
             # 4. التقارير
             if 'daily_reports' in data:
@@ -2023,6 +2399,7 @@ def delete_data(request):
         if delete_returns:
             count = ProductReturn.objects.count()
             ProductReturn.objects.all().delete()
+            rebuild_return_statistics()
             deleted_items.append(f'{count} مرتجع')
         
         if delete_orders:
@@ -2032,6 +2409,8 @@ def delete_data(request):
         
         if delete_products:
             count = Product.objects.count()
+            # تفريغ فهرس الإكمال التلقائي أولاً حتى لا يُحذف كل رقم منه على حدة
+            product_number_index.invalidate()
             Product.objects.all().delete()
             deleted_items.append(f'{count} منتج')
         
@@ -2079,18 +2458,39 @@ def delete_data(request):
 
 
 def orders_list(request):
-    """عرض قائمة الطلبات المسحوبة"""
-    orders = Order.objects.all()
+    """قائمة الطلبات المسحوبة - ترقيم بالمؤشر (keyset) على (created_at, id) بدون products_data"""
+    orders = Order.objects.defer('products_data').order_by('-created_at', '-id')
+    
+    page_size = parse_page_size(request.GET.get('page_size'), default=60)
+    try:
+        page = keyset_paginate(
+            orders,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size,
+        )
+    except InvalidCursor:
+        page = keyset_paginate(orders, page_size=page_size)
+    
+    def page_url(**cursor):
+        return '?' + urlencode({'page_size': page_size, **cursor})
+    
     return render(request, 'inventory_app/orders_list.html', {
-        'orders': orders
+        'orders': page,
+        'summary': get_orders_summary(),
+        'next_url': page_url(after=page.next_cursor) if page.has_next else None,
+        'previous_url': page_url(before=page.previous_cursor) if page.has_previous else None,
     })
 
 
 def order_detail(request, order_id):
     """عرض تفاصيل طلبية محددة"""
     order = get_object_or_404(Order, id=order_id)
+    # الطلبيات القديمة قبل تشغيل backfill_order_lines تُعرض من products_data
+    lines = list(order.lines.all()) or order.products_data
     return render(request, 'inventory_app/order_detail.html', {
-        'order': order
+        'order': order,
+        'lines': lines
     })
 
 
@@ -2134,6 +2534,9 @@ def reset_all_quantities(request):
         # تحديث جميع الكميات إلى 0
         updated_count = Product.objects.update(quantity=0)
         
+        # update() لا يرسل إشارات - تفريغ فهرس البحث ورفع إصدار المنتجات بعد نجاح المعاملة
+        product_cache.invalidate()
+        
         return JsonResponse({
             'success': True,
             'message': f'تم تصفير الكميات لجميع المنتجات بنجاح ({updated_count} منتج)',
@@ -2839,20 +3242,12 @@ def delete_staff(request, user_id):
 @staff_required
 def returns_list(request):
     """عرض قائمة المرتجعات"""
-    returns = ProductReturn.objects.all().order_by('-created_at')[:100]
-    
-    # إحصائيات
-    total_returns = ProductReturn.objects.count()
-    today_returns = ProductReturn.objects.filter(created_at__date=timezone.now().date()).count()
-    total_quantities_returned = ProductReturn.objects.aggregate(
-        total=db_models.Sum('total_quantities')
-    )['total'] or 0
+    returns = ProductReturn.objects.defer('products_data').order_by('-created_at')[:100]
     
+    # إحصائيات: من جدول العدادات (صفا اليوم والإجمالي) بدلاً من count/Sum على كل المرتجعات
     context = {
         'returns': returns,
-        'total_returns': total_returns,
-        'today_returns': today_returns,
-        'total_quantities_returned': total_quantities_returned,
+        **get_return_statistics(),
     }
     
     UserActivityLog.log_activity(
@@ -2869,14 +3264,8 @@ def returns_list(request):
 @login_required
 @staff_required
 def add_return(request):
-    """إضافة مرتجع جديد - صفحة النموذج"""
-    products = Product.objects.select_related('location').all().order_by('product_number')
-    
-    context = {
-        'products': products,
-    }
-    
-    return render(request, 'inventory_app/add_return.html', context)
+    """إضافة مرتجع جديد - صفحة النموذج (المنتجات تُجلب عند الكتابة من /api/products/typeahead/)"""
+    return render(request, 'inventory_app/add_return.html')
 
 
 @login_required
@@ -2884,6 +3273,7 @@ def add_return(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @transaction.atomic
+@idempotent('process_return')
 def process_return(request):
     """معالجة المرتجع وإضافة الكميات للمنتجات - بدقة عالية جداً"""
     try:
@@ -2901,7 +3291,6 @@ def process_return(request):
         
         # التحقق من صحة البيانات والحسابات قبل المعالجة
         validated_products = []
-        product_numbers = []
         
         for item in products_list:
             product_number = item.get('number', '').strip()
@@ -2923,7 +3312,6 @@ def process_return(request):
                     'error': f'كمية المنتج {product_number} غير صحيحة'
                 }, status=400)
             
-            product_numbers.append(product_number)
             validated_products.append({
                 'product_number': product_number,
                 'quantity': quantity
@@ -2935,85 +3323,29 @@ def process_return(request):
                 'error': 'لا توجد منتجات صحيحة للمعالجة'
             }, status=400)
         
-        # الحصول على جميع المنتجات دفعة واحدة مع lock للتأكد من الدقة
-        products_dict = {
-            p.product_number: p 
-            for p in Product.objects.filter(
-                product_number__in=product_numbers
-            ).select_for_update()
-        }
+        username = request.user.username if request.user.is_authenticated else 'Guest'
         
-        # التحقق من وجود جميع المنتجات
-        missing_products = [p['product_number'] for p in validated_products if p['product_number'] not in products_dict]
-        if missing_products:
+        # ربط اختياري بطلبية + إضافة كل الكميات بعبارة واحدة + المرتجع وأسطره
+        try:
+            product_return = create_product_return(
+                [(item['product_number'], item['quantity']) for item in validated_products],
+                username,
+                order_number=(data.get('order_number') or '').strip() or None,
+                return_reason=return_reason,
+                returned_by=returned_by,
+                notes=notes,
+            )
+        except ReturnError as e:
             return JsonResponse({
                 'success': False,
-                'error': f'المنتجات التالية غير موجودة: {", ".join(missing_products)}'
+                'error': str(e),
+                'errors': e.errors
             }, status=400)
         
-        # معالجة المرتجع مع تسجيل دقيق
-        return_products_data = []
-        total_quantities = 0
-        updated_products_count = 0
-        
-        for item in validated_products:
-            product_number = item['product_number']
-            return_quantity = item['quantity']
-            
-            product = products_dict[product_number]
-            
-            # الحصول على الكمية قبل التحديث بدقة
-            old_quantity = product.quantity
-            
-            # إضافة الكمية المرتجعة بدقة عالية
-            product.quantity = old_quantity + return_quantity
-            
-            # حفظ المنتج
-            product.save(update_fields=['quantity'])
-            
-            # تسجيل في AuditLog بدقة
-            AuditLog.objects.create(
-                action='quantity_added',
-                product=product,
-                product_number=product_number,
-                quantity_before=old_quantity,
-                quantity_after=product.quantity,
-                quantity_change=return_quantity,
-                notes=f'إرجاع {return_quantity} من المرتجع',
-                user=request.user.username if request.user.is_authenticated else 'Guest'
-            )
-            
-            # إضافة إلى بيانات المرتجع
-            return_products_data.append({
-                'product_number': product_number,
-                'product_name': product.name,
-                'quantity_before': old_quantity,
-                'quantity_returned': return_quantity,
-                'quantity_after': product.quantity,
-            })
-            
-            # حساب الإجماليات بدقة
-            total_quantities += return_quantity
-            updated_products_count += 1
-        
-        # إنشاء رقم مرتجع فريد
-        from datetime import datetime
-        import random
-        import string
-        
-        return_number = f"RET-{datetime.now().strftime('%Y%m%d%H%M%S')}-{''.join(random.choices(string.ascii_uppercase + string.digits, k=4))}"
-        
-        # إنشاء المرتجع
-        product_return = ProductReturn.objects.create(
-            return_number=return_number,
-            products_data=return_products_data,
-            total_products=updated_products_count,
-            total_quantities=total_quantities,
-            return_reason=return_reason if return_reason else None,
-            returned_by=returned_by if returned_by else None,
-            notes=notes if notes else None,
-            user=request.user.username if request.user.is_authenticated else 'Guest'
-        )
+        return_number = product_return.return_number
+        return_products_data = product_return.products_data
+        total_quantities = product_return.total_quantities
+        updated_products_count = product_return.total_products
         
         # تسجيل النشاط
         UserActivityLog.log_activity(
@@ -3044,6 +3376,8 @@ def process_return(request):
             'error': 'خطأ في قراءة البيانات'
         }, status=400)
     except Exception as e:
+        # الاستجابة ليست استثناء - نلغي المعاملة يدوياً حتى لا تُضاف كميات جزئية
+        transaction.set_rollback(True)
         logger.error(f'Error processing return: {str(e)}')
         security_logger.error(f'Error processing return: {str(e)} from IP: {request.META.get("REMOTE_ADDR")}')
         return JsonResponse({
@@ -3052,14 +3386,100 @@ def process_return(request):
         }, status=500)
 
 
+@login_required
+@staff_required
+@csrf_exempt
+@require_http_methods(["POST"])
+@transaction.atomic
+@idempotent('import_returns')
+def import_returns_file(request):
+    """
+    استيراد مرتجع من ملف CSV أو Excel (رقم المنتج، الكمية)
+    كل الأسطر الخاطئة تُرجع معاً - لا يُكتب شيء إلا إذا صحت كل الأسطر أو أُرسل skip_invalid
+    الأسطر الصالحة تمر بنفس مسار process_return (إضافة جماعية + مرتجع واحد)
+    """
+    uploaded_file = request.FILES.get('returns_file')
+    if uploaded_file is None:
+        return JsonResponse({'success': False, 'error': 'لم يتم إرسال ملف'}, status=400)
+    
+    try:
+        lines, row_errors = read_return_file(uploaded_file)
+    except ReturnError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception:
+        return JsonResponse({'success': False, 'error': 'تعذر قراءة الملف - يجب أن يكون CSV أو XLSX'}, status=400)
+    
+    # التحقق من كل أرقام المنتجات باستعلام واحد
+    row_errors.extend(validate_product_numbers(lines))
+    row_errors.sort(key=lambda error: error['row'])
+    
+    skip_invalid = request.POST.get('skip_invalid', '').lower() in ('1', 'true', 'on')
+    if row_errors:
+        invalid_rows = {error['row'] for error in row_errors}
+        lines = [line for line in lines if line[0] not in invalid_rows]
+    if row_errors and not skip_invalid:
+        return JsonResponse({
+            'success': False,
+            'error': f'يوجد {len(row_errors)} سطر غير صالح في الملف',
+            'row_errors': row_errors,
+            'valid_rows': len(lines),
+        }, status=400)
+    if not lines:
+        return JsonResponse({
+            'success': False,
+            'error': 'الملف لا يحتوي على أسطر صالحة',
+            'row_errors': row_errors,
+        }, status=400)
+    
+    username = request.user.username if request.user.is_authenticated else 'Guest'
+    try:
+        product_return = create_product_return(
+            [(number, quantity) for _, number, quantity in lines],
+            username,
+            order_number=(request.POST.get('order_number') or '').strip() or None,
+            return_reason=request.POST.get('return_reason', '').strip(),
+            returned_by=request.POST.get('returned_by', '').strip(),
+            notes=request.POST.get('notes', '').strip() or f'مستورد من الملف {uploaded_file.name}',
+        )
+    except ReturnError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'errors': e.errors
+        }, status=400)
+    
+    UserActivityLog.log_activity(
+        user=request.user,
+        action='order_created',
+        description=f'تم استيراد مرتجع من ملف: {product_return.return_number} - عدد المنتجات: {product_return.total_products} - الكمية: {product_return.total_quantities}',
+        request=request,
+        object_type='ProductReturn',
+        object_id=product_return.id,
+        object_name=product_return.return_number
+    )
+    logger.info(f'Return imported: {product_return.return_number} by {request.user.username}, Rows: {len(lines)}, Skipped: {len(row_errors)}')
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'تم استيراد المرتجع - تم إضافة {product_return.total_quantities} كمية إلى {product_return.total_products} منتج',
+        'return_number': product_return.return_number,
+        'return_id': product_return.id,
+        'products_updated': product_return.total_products,
+        'total_quantities': product_return.total_quantities,
+        'row_errors': row_errors,
+    })
+
+
 @login_required
 @staff_required
 def return_detail(request, return_id):
     """عرض تفاصيل مرتجع معين"""
-    product_return = get_object_or_404(ProductReturn, id=return_id)
+    product_return = get_object_or_404(ProductReturn.objects.select_related('order'), id=return_id)
     
     context = {
         'return': product_return,
+        # المرتجعات القديمة قبل تشغيل backfill_order_lines تُعرض من products_data
+        'lines': list(product_return.lines.all()) or product_return.products_data,
     }
     
     UserActivityLog.log_activity(
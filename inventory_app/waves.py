@@ -0,0 +1,173 @@
+"""
+التقاط الدفعات (Wave Picking)
+- دمج عدة قوائم التقاط (لكل مستلم قائمة) في رحلة واحدة
+- التخطيط: مجموع الكميات لكل منتج + فحص المخزون باستعلام واحد + مسار التقاط موحد
+- التأكيد: خصم كل الكميات بمسار الخصم الجماعي ثم طلبية Order لكل مستلم - في معاملة واحدة
+"""
+from collections import OrderedDict
+
+from django.db import transaction
+
+from .deductions import apply_deductions
+from .document_numbers import allocate_numbers, next_number, ORDER, WAVE
+from .models import Order
+from .order_lines import create_lines_for_orders
+from .routing import optimize_pick_route
+from .search import resolve_product_numbers
+
+
+MAX_PICK_LISTS = 200
+
+
+class WaveError(ValueError):
+    """بيانات الدفعة غير صالحة"""
+
+
+def parse_pick_lists(pick_lists):
+    """
+    التحقق من قوائم الالتقاط وتحويلها إلى [(اسم المستلم، [(رقم المنتج، الكمية)])]
+    يقبل number أو product_number لكل سطر
+    """
+    if not isinstance(pick_lists, list) or not pick_lists:
+        raise WaveError('لم يتم إرسال أي قائمة التقاط')
+    if len(pick_lists) > MAX_PICK_LISTS:
+        raise WaveError(f'عدد القوائم يتجاوز الحد الأقصى ({MAX_PICK_LISTS})')
+
+    parsed = []
+    for index, pick_list in enumerate(pick_lists, start=1):
+        if not isinstance(pick_list, dict):
+            raise WaveError(f'القائمة {index} غير صالحة')
+        lines = []
+        for item in pick_list.get('products', []):
+            number = str(item.get('number') or item.get('product_number') or '').strip()
+            if not number:
+                continue
+            try:
+                quantity = int(item.get('quantity', 0))
+            except (TypeError, ValueError):
+                raise WaveError(f'كمية المنتج {number} غير صحيحة في القائمة {index}')
+            # الكمية السالبة تنقص المجموع في الخطة فيظهر المنتج كافياً، ثم يرفضها apply_deductions عند التأكيد
+            if quantity < 0:
+                raise WaveError(f'الكمية غير صالحة للمنتج {number} في القائمة {index}')
+            lines.append((number, quantity))
+        if not lines:
+            raise WaveError(f'القائمة {index} لا تحتوي على منتجات')
+        parsed.append(((pick_list.get('recipient_name') or '').strip(), lines))
+    return parsed
+
+
+def _totals(parsed):
+    """مجموع الكميات لكل منتج مع توزيعها على المستلمين"""
+    totals = OrderedDict()
+    for list_index, (recipient_name, lines) in enumerate(parsed):
+        for number, quantity in lines:
+            entry = totals.setdefault(number, {'quantity': 0, 'recipients': []})
+            entry['quantity'] += quantity
+            entry['recipients'].append({
+                'list': list_index + 1,
+                'recipient_name': recipient_name,
+                'quantity': quantity,
+            })
+    return totals
+
+
+def plan_wave(pick_lists):
+    """خطة الدفعة: الكميات المجمعة لكل منتج وحالة المخزون والمسار الموحد"""
+    parsed = parse_pick_lists(pick_lists)
+    totals = _totals(parsed)
+
+    # المخزون والمواقع لكل منتجات الدفعة باستعلام واحد
+    products = resolve_product_numbers(totals.keys())
+
+    items = []
+    shortages = []
+    stops = []
+    for number, entry in totals.items():
+        product = products.get(number)
+        item = {
+            'product_number': number,
+            'total_quantity': entry['quantity'],
+            'recipients': entry['recipients'],
+            'found': product is not None,
+        }
+        if product is None:
+            shortages.append(number)
+        else:
+            item.update({
+                'name': product.name,
+                'available_quantity': product.quantity,
+                'sufficient': product.quantity >= entry['quantity'],
+                'location': f"R{product.row}C{product.column}" if product.row is not None else None,
+            })
+            if not item['sufficient']:
+                shortages.append(number)
+            if product.row is not None:
+                stops.append((number, product.row, product.column))
+        items.append(item)
+
+    return {
+        'pick_lists': len(parsed),
+        'products': items,
+        'total_quantity': sum(entry['quantity'] for entry in totals.values()),
+        'shortages': shortages,
+        'can_confirm': not shortages,
+        'route': optimize_pick_route(stops),
+    }
+
+
+def deduct_and_create_orders(parsed, username, notes=None):
+    """
+    خصم أسطر عدة قوائم معاً (كل شيء أو لا شيء) ثم طلبية لكل قائمة بإدخال واحد
+    parsed: [(اسم المستلم، [(رقم المنتج، الكمية)])] - يعيد (الطلبيات، updated_products لكل الأسطر)
+    يرفع DeductionError إذا لم يكفِ المخزون لأي سطر - يجب استدعاؤها داخل transaction.atomic
+    """
+    all_lines = [line for _, lines in parsed for line in lines]
+    updated_products = apply_deductions(all_lines, username)
+
+    # كتلة أرقام للطلبيات كلها بعبارة واحدة
+    order_numbers = allocate_numbers(ORDER, len(parsed))
+    orders = []
+    position = 0
+    for order_number, (recipient_name, lines) in zip(order_numbers, parsed):
+        products_data = updated_products[position:position + len(lines)]
+        position += len(lines)
+        orders.append(Order(
+            order_number=order_number,
+            products_data=products_data,
+            total_products=len(products_data),
+            total_quantities=sum(p['quantity_taken'] for p in products_data),
+            recipient_name=recipient_name or None,
+            notes=notes,
+            user=username,
+        ))
+
+    orders = Order.objects.bulk_create(orders)
+    create_lines_for_orders(orders)
+    return orders, updated_products
+
+
+@transaction.atomic
+def confirm_wave(pick_lists, username):
+    """
+    تأكيد الدفعة في معاملة واحدة:
+    خصم كل الأسطر معاً (كل شيء أو لا شيء) ثم طلبية لكل مستلم بإدخال واحد
+    يرفع DeductionError إذا لم يكفِ المخزون لأي سطر
+    """
+    parsed = parse_pick_lists(pick_lists)
+
+    wave_number = next_number(WAVE)
+    orders, updated_products = deduct_and_create_orders(parsed, username, notes=f'دفعة التقاط {wave_number}')
+
+    return {
+        'wave_number': wave_number,
+        'orders': [
+            {
+                'order_number': order.order_number,
+                'recipient_name': order.recipient_name,
+                'total_products': order.total_products,
+                'total_quantities': order.total_quantities,
+            }
+            for order in orders
+        ],
+        'updated_products': updated_products,
+    }
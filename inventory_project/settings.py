@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'inventory_app',
 ]
 
@@ -195,6 +196,20 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 # Password settings
 PASSWORD_RESET_TIMEOUT = 3600  # ساعة واحدة
 
+# محرك خصم الكميات عند تأكيد الطلبيات (انظر inventory_app/deductions.py)
+# locking: قفل الصفوف (select_for_update) - conditional: UPDATE مشروط بدون قفل مسبق
+DEDUCTION_ENGINE = config('DEDUCTION_ENGINE', default='locking')
+
+# أرقام الطلبيات والمرتجعات: عداد يبدأ من 1 كل يوم بدلاً من عداد متصل (انظر inventory_app/document_numbers.py)
+DOCUMENT_NUMBER_RESET_DAILY = config('DOCUMENT_NUMBER_RESET_DAILY', default=False, cast=bool)
+
+# تأكيد الطلبيات عبر قائمة الانتظار افتراضياً (يمكن تجاوزه بالحقل queued في الطلب)
+# يتطلب تشغيل المنفذ: manage.py process_confirmation_jobs --loop
+CONFIRM_PRODUCTS_QUEUED = config('CONFIRM_PRODUCTS_QUEUED', default=False, cast=bool)
+
+# مدة صلاحية مفاتيح Idempotency-Key بالساعات (التنظيف: manage.py cleanup_idempotency_keys)
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+
 # Rate limiting settings
 RATELIMIT_ENABLE = config('RATELIMIT_ENABLE', default=True, cast=bool)
 RATELIMIT_USE_CACHE = 'default'
@@ -16,19 +16,17 @@ async function checkLiveUpdates() {
     try {
         isUpdating = true;
         
-        // التحقق من عدد المنتجات
-        const response = await fetch('/api/get-stats/');
-        if (response.ok) {
-            const data = await response.json();
-            
-            // إذا تغير عدد المنتجات، هناك تحديث
-            if (data.products_count !== lastProductCount && lastProductCount !== 0) {
-                // هناك تحديث!
-                notifyLiveUpdate();
-                lastProductCount = data.products_count;
-            } else if (lastProductCount === 0) {
-                lastProductCount = data.products_count;
-            }
+        // التحقق من عدد المنتجات (GET شرطي - عند 304 تُعاد آخر نسخة محفوظة)
+        // نقارن دائماً لأن الشريط الجانبي قد يكون جلب النسخة الجديدة قبلنا
+        const { data } = await fetchWithETag('/api/get-stats/');
+        
+        // إذا تغير عدد المنتجات، هناك تحديث
+        if (data.products_count !== lastProductCount && lastProductCount !== 0) {
+            // هناك تحديث!
+            notifyLiveUpdate();
+            lastProductCount = data.products_count;
+        } else if (lastProductCount === 0) {
+            lastProductCount = data.products_count;
         }
     } catch (error) {
         // Silently fail
@@ -7,6 +7,7 @@ const clearBtn = document.getElementById('clear-btn');
 const productNumbersTextarea = document.getElementById('product-numbers');
 const resultsSection = document.getElementById('results-section');
 const recipientNameInput = document.getElementById('recipient-name');
+const optimizeRouteCheckbox = document.getElementById('optimize-route');
 const resultsContainer = document.getElementById('results-container');
 const resultsCount = document.getElementById('results-count');
 const loadingEl = document.getElementById('loading');
@@ -44,6 +45,13 @@ async function handleSearch() {
     try {
         // معالجة الإدخال (دعم الكمية)
         const searchData = parseSearchInput(input);
+        searchData.optimize_route = optimizeRouteCheckbox ? optimizeRouteCheckbox.checked : false;
+        
+        // القوائم الكبيرة: بث النتائج وعرضها فور وصولها
+        if (searchData.products.length >= STREAM_SEARCH_THRESHOLD && window.ReadableStream && window.TextDecoder) {
+            await streamSearch(searchData);
+            return;
+        }
         
         const response = await fetch('/api/search/', {
             method: 'POST',
@@ -59,7 +67,7 @@ async function handleSearch() {
             currentResults = data.results;
             displayResults(data.results);
             updateResultsCount(data.results);
-            drawWarehouse(data.results);
+            drawWarehouse(data.results, data.route);
         } else {
             throw new Error('لم يتم إرجاع نتائج من الخادم');
         }
@@ -71,6 +79,76 @@ async function handleSearch() {
     }
 }
 
+// الحد الأدنى لعدد الأرقام لاستخدام وضع البث (NDJSON)
+const STREAM_SEARCH_THRESHOLD = 200;
+
+// البحث بوضع البث - كل سطر في الاستجابة نتيجة منتج واحد
+async function streamSearch(searchData) {
+    const response = await fetch('/api/search/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/x-ndjson',
+        },
+        body: JSON.stringify(searchData)
+    });
+    
+    if (!response.ok || !response.body) {
+        throw new Error('لم يتم إرجاع نتائج من الخادم');
+    }
+    
+    currentResults = [];
+    startStreamingResults();
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let route = null;
+    
+    const handleLine = (line) => {
+        if (!line.trim()) return;
+        const product = JSON.parse(line);
+        // السطر الأخير عند طلب ترتيب المسار
+        if (product.route) {
+            route = product.route;
+            return;
+        }
+        resultsContainer.appendChild(createProductCard(product, currentResults.length));
+        currentResults.push(product);
+        // إخفاء التحميل بعد وصول أول نتيجة
+        if (currentResults.length === 1) {
+            hideLoading();
+        }
+    };
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+        updateResultsCount(currentResults);
+    }
+    handleLine(buffer + decoder.decode());
+    
+    if (currentResults.length === 0) {
+        displayResults([]);
+    }
+    updateResultsCount(currentResults);
+    drawWarehouse(currentResults, route);
+}
+
+// تجهيز حاوية النتائج لاستقبال البطاقات تدريجياً
+function startStreamingResults() {
+    resultsContainer.innerHTML = '';
+    resultsContainer.style.display = 'grid';
+    resultsContainer.style.gridTemplateColumns = 'repeat(auto-fill, minmax(300px, 1fr))';
+    resultsContainer.style.gap = '10px';
+    resultsSection.style.display = 'block';
+}
+
 // معالجة الإدخال لفصل الأرقام والكميات
 function parseSearchInput(input) {
     const lines = input.split('\n').filter(line => line.trim());
@@ -264,6 +342,11 @@ function createProductCard(product, index) {
         ${quantityInfo}
         ${locationsHtml}
         ${!product.found ? `<p style="color: var(--error-color); margin-top: 10px; font-size: 0.85rem;">${product.error || 'لم يتم العثور على هذا المنتج'}</p>` : ''}
+        ${!product.found && product.suggestions && product.suggestions.length > 0 ? `
+            <p style="margin-top: 5px; font-size: 0.85rem; color: var(--text-secondary);">
+                💡 هل تقصد: ${product.suggestions.map(number => `<code>${number}</code>`).join(' ، ')}
+            </p>
+        ` : ''}
     `;
     
     // إضافة تأثير الظهور
@@ -287,7 +370,8 @@ let zoomLevel = 1;
 let showOnlyProducts = false;
 
 // رسم خريطة المستودع - الحصول على البيانات من السيرفر
-async function drawWarehouse(results) {
+// route (اختياري): مسار الالتقاط المرتب من /api/search/ مع optimize_route
+async function drawWarehouse(results, route) {
     const foundProducts = results.filter(p => p.found && p.locations && p.locations.length > 0);
     
     if (foundProducts.length === 0) {
@@ -391,6 +475,7 @@ async function drawWarehouse(results) {
             // جعل جميع الخلايا بنفس الحجم والتصميم لمنع التداخل - دقة عالية
             cell.style.cssText = `width: ${cellSize}; height: ${cellSize}; display: flex; flex-direction: column; align-items: center; justify-content: center; border: 2px solid #e2e8f0; flex-shrink: 0; position: relative; overflow: hidden;`;
             cell.classList.add('warehouse-grid-cell');
+            cell.dataset.location = key;
             
             const locationText = `R${row}C${col}`;
             
@@ -444,6 +529,61 @@ async function drawWarehouse(results) {
         
         gridContainer.appendChild(rowDiv);
     }
+    
+    drawPickRoute(gridContainer, route);
+}
+
+// رسم مسار الالتقاط فوق الشبكة: رقم المحطة في كل خلية + خط يصل المحطات بالترتيب
+function drawPickRoute(gridContainer, route) {
+    let summary = document.getElementById('route-summary');
+    if (!route || !route.sequence || route.sequence.length === 0) {
+        if (summary) summary.remove();
+        return;
+    }
+    
+    const points = [];
+    route.sequence.forEach(stop => {
+        const cell = gridContainer.querySelector(`[data-location="${stop.row},${stop.column}"]`);
+        if (!cell) return;
+        
+        // offsetLeft/offsetTop بالنسبة للشبكة (position: relative)
+        points.push(`${cell.offsetLeft + cell.offsetWidth / 2},${cell.offsetTop + cell.offsetHeight / 2}`);
+        
+        const badge = document.createElement('div');
+        badge.className = 'route-stop-badge';
+        badge.textContent = stop.stop;
+        badge.style.cssText = 'position: absolute; top: 1px; left: 1px; min-width: 16px; height: 16px; padding: 0 3px; border-radius: 8px; background: #1e293b; color: #fbbf24; font-size: 0.6rem; font-weight: bold; line-height: 16px; text-align: center;';
+        cell.appendChild(badge);
+        cell.title += `\nالمحطة: ${stop.stop}`;
+    });
+    
+    const svgNS = 'http://www.w3.org/2000/svg';
+    const svg = document.createElementNS(svgNS, 'svg');
+    svg.setAttribute('width', gridContainer.scrollWidth);
+    svg.setAttribute('height', gridContainer.scrollHeight);
+    svg.style.cssText = 'position: absolute; top: 0; left: 0; pointer-events: none; z-index: 5;';
+    
+    const polyline = document.createElementNS(svgNS, 'polyline');
+    polyline.setAttribute('points', points.join(' '));
+    polyline.setAttribute('fill', 'none');
+    polyline.setAttribute('stroke', '#fbbf24');
+    polyline.setAttribute('stroke-width', '3');
+    polyline.setAttribute('stroke-linejoin', 'round');
+    polyline.setAttribute('stroke-dasharray', '6 4');
+    svg.appendChild(polyline);
+    
+    gridContainer.style.position = 'relative';
+    gridContainer.appendChild(svg);
+    
+    // ملخص المسافة فوق الشبكة
+    if (!summary) {
+        summary = document.createElement('div');
+        summary.id = 'route-summary';
+        summary.style.cssText = 'margin-bottom: 15px; padding: 10px 15px; background: #fffbeb; border: 1px solid #fbbf24; border-radius: 8px; color: #92400e; font-weight: bold;';
+        const wrapper = gridContainer.parentElement;
+        wrapper.parentElement.insertBefore(summary, wrapper);
+    }
+    summary.textContent = `🚶 مسار الالتقاط: ${route.sequence.length} محطة - المسافة ${route.total_distance} خطوة (بترتيب الإدخال: ${route.input_distance} خطوة)`;
 }
 
 // تم حذف دوال العرض البسيط - الآن نعرض الشبكة دائماً على جميع الأحجام بدقة عالية
@@ -576,6 +716,35 @@ function updateConfirmButton() {
     }
 }
 
+// مفتاح Idempotency-Key للطلب الجاري (يبقى حتى يصل رد من الخادم)
+let pendingConfirm = null;
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
+// متابعة طلب تأكيد في قائمة الانتظار - يعيد نفس صيغة استجابة التأكيد المباشر
+async function waitForConfirmationJob(ticket, timeoutMs = 60000) {
+    const deadline = Date.now() + timeoutMs;
+    let delay = 300;
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, delay));
+        const response = await fetch(`/api/confirm-products/jobs/${ticket}/`);
+        const job = await response.json();
+        if (job.success && job.status !== 'pending') {
+            return job.result;
+        }
+        delay = Math.min(delay * 2, 2000);
+    }
+    return {
+        success: false,
+        error: `الطلب ما زال في الانتظار - رقم التذكرة: ${ticket}`
+    };
+}
+
 // تأكيد أخذ المنتجات
 async function confirmSelectedProducts() {
     if (selectedProducts.length === 0) {
@@ -616,16 +785,30 @@ async function confirmSelectedProducts() {
         return;
     }
     
+    // نفس المفتاح عند إعادة إرسال نفس الطلب بعد انقطاع الشبكة - الخادم يُرجع النتيجة الأصلية بدلاً من خصم ثانٍ
+    const body = JSON.stringify({ products: selectedProducts, recipient_name: recipientName });
+    if (!pendingConfirm || pendingConfirm.body !== body) {
+        pendingConfirm = { body: body, key: newIdempotencyKey() };
+    }
+    
     try {
         const response = await fetch('/api/confirm-products/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Idempotency-Key': pendingConfirm.key,
             },
-            body: JSON.stringify({ products: selectedProducts, recipient_name: recipientName })
+            body: body
         });
         
-        const data = await response.json();
+        let data = await response.json();
+        // وصل رد من الخادم - المحاولة التالية عملية جديدة
+        pendingConfirm = null;
+        
+        // الوضع غير المتزامن: متابعة التذكرة حتى يُنفذ الطلب
+        if (data.success && data.queued) {
+            data = await waitForConfirmationJob(data.ticket);
+        }
         
         if (data.success) {
             // إظهار إشعار بالنجاح وحفظ الطلبية
@@ -93,11 +93,40 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// جلب JSON مع GET شرطي (ETag): يرسل If-None-Match ويعيد النسخة المحفوظة عند 304
+const etagCache = {};
+
+async function fetchWithETag(url) {
+    const cached = etagCache[url];
+    const headers = {};
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    
+    const response = await fetch(url, { headers, cache: 'no-store' });
+    
+    if (response.status === 304 && cached) {
+        return { data: cached.data, notModified: true };
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        etagCache[url] = { etag, data };
+    }
+    return { data, notModified: false };
+}
+
 // تحديث الإحصائيات الحية
 function updateSidebarStats() {
-    fetch('/api/get-stats/')
-        .then(response => response.json())
-        .then(data => {
+    fetchWithETag('/api/get-stats/')
+        .then(({ data, notModified }) => {
+            // لا تغيير منذ آخر تحديث
+            if (notModified) return;
+            
             // 📦 المنتجات
             // إجمالي
             const productsElement = document.getElementById('stats-products');